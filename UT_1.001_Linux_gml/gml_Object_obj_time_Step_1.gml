@@ -1,5 +1,6 @@
 global.timer = ((get_timer() - 34000) + global.lastReloadTimer)
 global.timerstring = string(global.timer)
+global.stepCount += 1
 comment = "This will start out equal but will eventually drift to be slightly late"
 time += 1
 if (jt == 0)
@@ -10,8 +10,7 @@ if (((((global.seed * 214013) + 2531011) >> 16) & 65535) != global.stateIndex)
     global.stateIndex = ((((global.seed * 214013) + 2531011) >> 16) & 65535)
     global.otherLastTimer = global.lastTimer
     global.lastTimer = global.timer
-    appendFile = file_text_open_append("states.txt")
-    file_text_write_string(appendFile, ((((string(global.stateIndex) + ",") + global.timerstring) + ",") + string(global.seed)))
-    file_text_writeln(appendFile)
-    file_text_close(appendFile)
+    ds_list_add(global.stateBuffer, ((((((string(global.stateIndex) + ",") + global.timerstring) + ",") + string(global.seed)) + ",") + string(global.stepCount)))
+    if (ds_list_size(global.stateBuffer) >= 64)
+        scr_flushstates()
 }
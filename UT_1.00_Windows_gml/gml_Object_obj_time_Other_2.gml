@@ -8,7 +8,12 @@ global.otherLastState = ini_read_real("General", "otherLastState", 0)
 global.seed = ini_read_real("General", "seed", 0)
 global.lastSeed = ini_read_real("General", "lastSeed", 0)
 global.otherLastSeed = ini_read_real("General", "otherLastSeed", 0)
+global.stepCount = ini_read_real("General", "steps", 0)
 ini_close()
+if variable_global_exists("stateBuffer")
+    scr_flushstates()
+else
+    global.stateBuffer = ds_list_create()
 SCR_GAMESTART(0, 0, 0, 0, 0)
 time = 0
 image_speed = 0
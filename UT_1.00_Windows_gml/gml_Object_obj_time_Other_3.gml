@@ -8,4 +8,6 @@ ini_write_real("General", "otherLastState", global.otherLastState)
 ini_write_real("General", "seed", global.seed)
 ini_write_real("General", "lastSeed", global.lastSeed)
 ini_write_real("General", "otherLastSeed", global.otherLastSeed)
+ini_write_real("General", "steps", global.stepCount)
 ini_close()
+scr_flushstates()
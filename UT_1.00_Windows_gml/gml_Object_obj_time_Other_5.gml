@@ -0,0 +1 @@
+scr_flushstates()
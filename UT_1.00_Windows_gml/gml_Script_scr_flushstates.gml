@@ -0,0 +1,12 @@
+var appendFile, i;
+if (ds_list_size(global.stateBuffer) > 0)
+{
+    appendFile = file_text_open_append("states.txt")
+    for (i = 0; i < ds_list_size(global.stateBuffer); i += 1)
+    {
+        file_text_write_string(appendFile, ds_list_find_value(global.stateBuffer, i))
+        file_text_writeln(appendFile)
+    }
+    file_text_close(appendFile)
+    ds_list_clear(global.stateBuffer)
+}
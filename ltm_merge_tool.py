@@ -1,20 +1,55 @@
 from tarfile import open as topen
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, wait
+from fractions import Fraction
+from functools import lru_cache
+from itertools import islice
 import configparser
+import copy
+import gzip
+import io
+import mmap
+import multiprocessing
 import os
+import re
 import shutil
+import struct
+import sys
+import tarfile
+import tempfile
+import time
+
+try:
+    import numpy as np
+except ImportError: # NumPy is optional, the batch functions fall back to pure Python without it
+    np = None
 
 def randomizeMicrosState(micros):
     """
     Takes an integer number of microseconds and returns an index representing the initial RNG state.
+    Results are kept in a bounded cache, see configureMicrosCache().
 
     Args:
         micros (int): An integer number of microseconds.
-        seed (int, optional): The
 
     Returns:
         int: The RNG state for the input microseconds.
     """
-    seed = randomizeMicrosSeed(micros)
+    if _microsStateCache != None:
+        return _microsStateCache(micros)
+    return _randomizeMicrosState(micros)
+
+def _randomizeMicrosState(micros):
+    """
+    The uncached version of randomizeMicrosState().
+    """
+    if _seedTable != None and _seedTable.covers(micros):
+        return int(_seedTable.states[micros - _seedTable.baseMicros])
+
+    seed = _randomizeMicrosSeed(micros)
 
     stateIndex = seedToState(seed)
 
@@ -23,6 +58,7 @@ def randomizeMicrosState(micros):
 def randomizeMicrosSeed(micros):
     """
     Takes an integer number of microseconds and returns an index representing the RNG seed.
+    Results are kept in a bounded cache, see configureMicrosCache().
 
     Args:
         micros (int): An integer number of microseconds.
@@ -30,6 +66,14 @@ def randomizeMicrosSeed(micros):
     Returns:
         int: The RNG seed for the input microseconds.
 
+    """
+    if _microsSeedCache != None:
+        return _microsSeedCache(micros)
+    return _randomizeMicrosSeed(micros)
+
+def _randomizeMicrosSeed(micros):
+    """
+    The uncached version of randomizeMicrosSeed().
     """
     timeOffset = 0
 
@@ -48,6 +92,63 @@ def randomizeMicrosSeed(micros):
 
     return seed
 
+# Least recently used caches around randomizeMicrosState() and randomizeMicrosSeed(), set up with configureMicrosCache()
+_microsStateCache = lru_cache(maxsize = 0x10000)(_randomizeMicrosState)
+_microsSeedCache = lru_cache(maxsize = 0x10000)(_randomizeMicrosSeed)
+
+def configureMicrosCache(maxsize = 0x10000, enabled = True):
+    """
+    Sets up the caches used by randomizeMicrosState() and randomizeMicrosSeed(), which also clears them.
+    Each cache holds at most maxsize values and drops the least recently used value past that, so long scans can't grow it without bound.
+    The batch functions and the searches built on them compute whole chunks without going through the caches,
+    so the caches hold single lookups, like the start states in appendResetAndSeed() and mergeMany() and interactive use.
+
+    Args:
+        maxsize (int, optional): The number of values each cache holds. Defaults to 0x10000.
+        enabled (bool, optional): Whether to cache at all. Defaults to True.
+
+    Returns:
+        None.
+    """
+    global _microsStateCache, _microsSeedCache
+
+    if enabled:
+        _microsStateCache = lru_cache(maxsize = maxsize)(_randomizeMicrosState)
+        _microsSeedCache = lru_cache(maxsize = maxsize)(_randomizeMicrosSeed)
+    else:
+        _microsStateCache = None
+        _microsSeedCache = None
+
+def clearMicrosCache():
+    """
+    Empties the caches used by randomizeMicrosState() and randomizeMicrosSeed() and resets their counters.
+
+    Returns:
+        None.
+    """
+    if _microsStateCache != None:
+        _microsStateCache.cache_clear()
+        _microsSeedCache.cache_clear()
+
+def microsCacheInfo():
+    """
+    Returns the counters of the caches used by randomizeMicrosState() and randomizeMicrosSeed().
+
+    Returns:
+        dict: {"state": counters, "seed": counters}, where the counters are a dict with keys hits, misses, hitRate, size and maxsize.
+              Returns None if caching is turned off.
+    """
+    if _microsStateCache == None:
+        return None
+
+    counters = {}
+    for name, cache in (("state", _microsStateCache), ("seed", _microsSeedCache)):
+        info = cache.cache_info()
+        lookups = info.hits + info.misses
+        counters[name] = {"hits": info.hits, "misses": info.misses, "hitRate": info.hits / lookups if lookups > 0 else 0.0,
+                          "size": info.currsize, "maxsize": info.maxsize}
+    return counters
+
 def seedToState(seed):
     """
     Converts from a seed to an RNG state index. This formula was datamined by colinator27.
@@ -66,9 +167,267 @@ def seedToState(seed):
 
     return stateIndex
 
+def seedToMicros(seed, startMicros, count = 1, searchSizeLimit = 0x10000000000):
+    """
+    Finds the next microsecond values that produce the given seed, starting with the given value of startMicros.
+    This inverts randomizeMicrosSeed() directly instead of trying every microsecond value.
+
+    Args:
+        seed (int): The seed that is to be matched.
+        startMicros (int): The minimum value of microseconds to return.
+        count (int, optional): The maximum number of microsecond values to return. Defaults to 1.
+        searchSizeLimit (int, optional): The number of microseconds after startMicros to search. Defaults to 0x10000000000 (about 12.7 days).
+
+    Returns:
+        list: The matching microsecond values in increasing order. This can be shorter than count, or empty if no value is found.
+    """
+    seed = seed & 0xFFFFFFFF
+    stopMicros = startMicros + searchSizeLimit
+    microsList = []
+
+    # The upper 32 bits of the time only get added into the seed, so each 2^32 microsecond block is solved separately.
+    highWord = startMicros >> 0x20
+    while len(microsList) < count and highWord << 0x20 < stopMicros:
+        for timeVariable32 in _solveSeedLow32(seed, highWord):
+            micros = highWord << 0x20 | timeVariable32
+            if micros >= stopMicros or len(microsList) >= count:
+                break
+            if micros >= startMicros:
+                microsList += [micros]
+        highWord += 1
+
+    return microsList
+
+def _solveSeedLow32(seed, highWord):
+    """
+    Finds every lower 32 bits of the time that produce the given seed for the given upper 32 bits of the time.
+
+    Splitting the lower 32 bits into a high half a and a low half b, randomizeMicrosSeed() gives
+        seed low half  = a ^ (b + highWord low half)
+        seed high half = b ^ (a + highWord high half + carry out of the low half sum)
+    Both are solved one bit of b at a time from the bottom up, since the low bits of a sum only depend on the low bits of its terms.
+
+    Args:
+        seed (int): The 32 bit seed that is to be matched.
+        highWord (int): The upper 32 bits of the time.
+
+    Returns:
+        list: The matching lower 32 bits of the time, in increasing order.
+    """
+    highLow = highWord & 0xFFFF
+    highHigh = (highWord >> 0x10) & 0xFFFF
+    seedLow = seed & 0xFFFF
+    seedHigh = seed >> 0x10
+
+    solutions = []
+    for carry in (0, 1): # The carry out of the low half depends on every bit of b, so guess it and check it at the end
+        partials = [0]
+        for bit in range(0x10):
+            mask = (2 << bit) - 1
+            nextPartials = []
+            for partial in partials:
+                for candidate in (partial, partial | 1 << bit):
+                    a = seedLow ^ ((candidate + highLow) & 0xFFFF)
+                    if (seedHigh ^ ((a + highHigh + carry) & 0xFFFF) ^ candidate) & mask == 0:
+                        nextPartials += [candidate]
+            partials = nextPartials
+
+        for b in partials:
+            if (b + highLow) >> 0x10 == carry:
+                a = seedLow ^ ((b + highLow) & 0xFFFF)
+                solutions += [a << 0x10 | b]
+
+    return sorted(solutions)
+
+def randomizeMicrosSeedArray(micros, chunkSize = 0x100000):
+    """
+    Batch version of randomizeMicrosSeed(). Uses NumPy if it is installed, otherwise falls back to pure Python.
+
+    Args:
+        micros (numpy.ndarray, tuple, or iterable): The microsecond values, either as a uint64 array,
+                                                    a (start, stop) tuple, or any iterable of integers.
+        chunkSize (int, optional): The number of values computed at once, which bounds the temporary memory used. Defaults to 0x100000.
+
+    Returns:
+        numpy.ndarray or array: The uint32 RNG seeds for the input microseconds.
+    """
+    if np == None:
+        return array("I", map(_randomizeMicrosSeed, _microsIterable(micros)))
+
+    micros = _microsNumpy(micros)
+    seeds = np.empty(len(micros), dtype=np.uint32)
+    for chunkStart in range(0, len(micros), chunkSize):
+        seeds[chunkStart:chunkStart + chunkSize] = _numpySeeds(_numpyChunk(micros, chunkStart, chunkSize))
+    return seeds
+
+def seedToStateArray(seeds, chunkSize = 0x100000):
+    """
+    Batch version of seedToState(). Uses NumPy if it is installed, otherwise falls back to pure Python.
+
+    Args:
+        seeds (numpy.ndarray or iterable): The RNG seeds.
+        chunkSize (int, optional): The number of values computed at once, which bounds the temporary memory used. Defaults to 0x100000.
+
+    Returns:
+        numpy.ndarray or array: The uint16 RNG state indices for the input seeds.
+    """
+    if np == None:
+        return array("H", map(seedToState, seeds))
+
+    seeds = np.asarray(seeds)
+    states = np.empty(len(seeds), dtype=np.uint16)
+    for chunkStart in range(0, len(seeds), chunkSize):
+        states[chunkStart:chunkStart + chunkSize] = _numpyStates(seeds[chunkStart:chunkStart + chunkSize])
+    return states
+
+def randomizeMicrosStateArray(micros, chunkSize = 0x100000):
+    """
+    Batch version of randomizeMicrosState(). Uses NumPy if it is installed, otherwise falls back to pure Python.
+
+    Args:
+        micros (numpy.ndarray, tuple, or iterable): The microsecond values, either as a uint64 array,
+                                                    a (start, stop) tuple, or any iterable of integers.
+        chunkSize (int, optional): The number of values computed at once, which bounds the temporary memory used. Defaults to 0x100000.
+
+    Returns:
+        numpy.ndarray or array: The uint16 RNG state indices for the input microseconds.
+    """
+    if np == None:
+        return array("H", map(_randomizeMicrosState, _microsIterable(micros)))
+
+    micros = _microsNumpy(micros)
+    states = np.empty(len(micros), dtype=np.uint16)
+    for chunkStart in range(0, len(micros), chunkSize):
+        states[chunkStart:chunkStart + chunkSize] = _numpyStates(_numpySeeds(_numpyChunk(micros, chunkStart, chunkSize)))
+    return states
+
+def seedChunks(startMicros, stopMicros, chunkSize = 0x100000):
+    """
+    Generates the seeds from startMicros up to but not including stopMicros one chunk at a time, so any range can be scanned in bounded memory.
+    The first chunks are smaller so that scans which stop early don't compute a full chunk.
+
+    Args:
+        startMicros (int): The first microsecond value.
+        stopMicros (int): The microsecond value to stop before.
+        chunkSize (int, optional): The largest number of values in one chunk. Defaults to 0x100000.
+
+    Yields:
+        int, numpy.ndarray or array: The micros of the first value in the chunk and the seeds of the chunk.
+    """
+    for chunkStart, chunkStop in _chunkRanges(startMicros, stopMicros, chunkSize):
+        yield chunkStart, randomizeMicrosSeedArray((chunkStart, chunkStop), chunkSize)
+
+def stateChunks(startMicros, stopMicros, chunkSize = 0x100000):
+    """
+    Generates the state indices from startMicros up to but not including stopMicros one chunk at a time, so any range can be scanned in bounded memory.
+    The first chunks are smaller so that scans which stop early don't compute a full chunk.
+
+    Args:
+        startMicros (int): The first microsecond value.
+        stopMicros (int): The microsecond value to stop before.
+        chunkSize (int, optional): The largest number of values in one chunk. Defaults to 0x100000.
+
+    Yields:
+        int, numpy.ndarray or array: The micros of the first value in the chunk and the state indices of the chunk.
+    """
+    for chunkStart, chunkStop in _chunkRanges(startMicros, stopMicros, chunkSize):
+        if _seedTable == None:
+            yield chunkStart, randomizeMicrosStateArray((chunkStart, chunkStop), chunkSize)
+        else:
+            yield chunkStart, _seedTable.stateRange(chunkStart, chunkStop)
+
+def _chunkRanges(startMicros, stopMicros, chunkSize):
+    """
+    Splits a range of micros into (start, stop) chunks, doubling in size from 0x1000 up to chunkSize.
+    """
+    thisChunkSize = min(0x1000, chunkSize)
+    while startMicros < stopMicros:
+        chunkStop = min(startMicros + thisChunkSize, stopMicros)
+        yield startMicros, chunkStop
+        startMicros = chunkStop
+        thisChunkSize = min(thisChunkSize * 2, chunkSize)
+
+def _microsIterable(micros):
+    """
+    Converts a (start, stop) tuple to a range, leaving any other iterable of microsecond values as it is.
+    """
+    if isinstance(micros, tuple):
+        return range(*micros)
+    return micros
+
+def _microsNumpy(micros):
+    """
+    Converts a (start, stop) tuple to a range, and any other iterable of microsecond values apart from a range to a uint64 NumPy array.
+    Ranges are left as they are so they can be turned into arrays one chunk at a time with _numpyChunk().
+    """
+    if isinstance(micros, tuple):
+        return range(*micros)
+    if isinstance(micros, range):
+        return micros
+    return np.asarray(micros, dtype=np.uint64)
+
+def _numpyChunk(micros, chunkStart, chunkSize):
+    """
+    Returns up to chunkSize values of a range or NumPy array from _microsNumpy() starting at index chunkStart, as a uint64 NumPy array.
+    """
+    chunk = micros[chunkStart:chunkStart + chunkSize]
+    if isinstance(chunk, range):
+        return np.arange(chunk.start, chunk.stop, chunk.step, dtype=np.uint64)
+    return chunk
+
+def _numpySeeds(micros):
+    """
+    The formula from randomizeMicrosSeed() on a uint64 NumPy array.
+    """
+    timeVariable32 = micros & 0xFFFFFFFF
+    seeds = ((timeVariable32 << 0x10) | (timeVariable32 >> 0x10)) ^ ((micros >> 0x20) + timeVariable32)
+    return (seeds & 0xFFFFFFFF).astype(np.uint32)
+
+def _numpyStates(seeds):
+    """
+    The formula from seedToState() on a NumPy array of seeds.
+    """
+    seeds = seeds.astype(np.uint64)
+    return (((seeds * 0x343FD + 0x269EC3) >> 0x10) & 0xFFFF).astype(np.uint16)
+
+def _firstIndex(values, value):
+    """
+    Returns the index of the first element of a NumPy array or array equal to value, or -1 if there isn't one.
+    """
+    if np == None:
+        try:
+            return values.index(value)
+        except ValueError:
+            return -1
+
+    indices = np.flatnonzero(values == value)
+    if len(indices) == 0:
+        return -1
+    return int(indices[0])
+
+def _stateRuns(states):
+    """
+    Splits a chunk of state indices into runs of identical consecutive values.
+
+    Args:
+        states (numpy.ndarray or array): The state indices.
+
+    Returns:
+        list or numpy.ndarray, list or numpy.ndarray: The index in the chunk where each run starts, and the length of each run.
+    """
+    if np == None:
+        runStarts = [index for index in range(len(states)) if index == 0 or states[index] != states[index - 1]]
+        runLengths = [nextStart - runStart for runStart, nextStart in zip(runStarts, runStarts[1:] + [len(states)])]
+        return runStarts, runLengths
+
+    runStarts = np.flatnonzero(states[1:] != states[:-1]) + 1
+    runStarts = np.concatenate(([0], runStarts))
+    runLengths = np.diff(np.append(runStarts, len(states)))
+    return runStarts, runLengths
+
 def trySeedsUpTo(microsMax):
     """
-    Outputs a text file with lines of micros,seed from 0 to microsMax.
+    Outputs a text file with lines of micros,seed,state from 0 to microsMax.
 
     Args:
         microsMax (int): An integer number of microseconds representing the maximum microseconds to be output.
@@ -79,10 +438,7 @@ def trySeedsUpTo(microsMax):
     File outputs:
         seeds.csv: A text file output in the working directory, with each line formatted as micros,seed,state from 0 micros up to microsMax.
     """
-    with open("seeds.csv", "w") as fid:
-        fid.write("micros,seed\n")
-        for i in range(microsMax):
-            fid.write("{0},{1}\n".format(i, randomizeMicrosSeed(i), randomizeMicrosState(i)))
+    exportSeeds(0, microsMax)
 
 def trySeedsUpTo_SeedsOnly(microsMax):
     """
@@ -97,14 +453,11 @@ def trySeedsUpTo_SeedsOnly(microsMax):
     File outputs:
         seeds.csv: A text file output in the working directory, with each line listing one seed ordered from 0 micros up to microsMax.
     """
-    with open("seeds.csv", "w") as fid:
-        fid.write("seed\n")
-        for i in range(microsMax):
-            fid.write("{0}\n".format(randomizeMicrosSeed(i)))
+    exportSeeds(0, microsMax, columns = ("seed",))
 
 def trySeedsRange(microsMin, microsMax):
     """
-    Outputs a text file with lines of micros,seed from microsMin to microsMax.
+    Outputs a text file with lines of micros,seed,state from microsMin to microsMax.
 
     Args:
         microsMin (int): An integer number of microseconds representing the minimum microseconds to be output.
@@ -116,10 +469,73 @@ def trySeedsRange(microsMin, microsMax):
     File outputs:
         seeds.csv: A text file output in the working directory, with each line formatted as micros,seed,state from microsMin up to microsMax.
     """
-    with open("seeds.csv", "w") as fid:
-        fid.write("micros,seed\n")
-        for i in range(microsMin, microsMax):
-            fid.write("{0},{1}\n".format(i, randomizeMicrosSeed(i), randomizeMicrosState(i)))
+    exportSeeds(microsMin, microsMax)
+
+# The packed little-endian type of each column in the binary export format
+exportColumnFormats = {"micros": "Q", "seed": "I", "state": "H"}
+
+def exportSeeds(microsMin, microsMax, outputPath = "seeds.csv", columns = ("micros", "seed", "state"), fileFormat = "csv",
+                compress = False, chunkSize = 0x100000, bufferSize = 0x1000000):
+    """
+    Streams the seeds and state indices from microsMin up to but not including microsMax into a file, one chunk at a time.
+
+    The csv format has a header line naming the columns, then one line per micros.
+    The binary format has no header, just one packed little-endian row per micros with the columns in the given order,
+    using uint64 for micros, uint32 for seed and uint16 for state. Rows have no padding, so for example
+    numpy.memmap(outputPath, dtype=[("seed", "<u4"), ("state", "<u2")]) reads back columns ("seed", "state").
+
+    Args:
+        microsMin (int): The first microsecond value to output.
+        microsMax (int): The microsecond value to stop before.
+        outputPath (str, optional): Path to the output file. Defaults to "seeds.csv". Will be overwritten if it exists.
+        columns (tuple, optional): The columns to output, from "micros", "seed" and "state". Defaults to ("micros", "seed", "state").
+        fileFormat (str, optional): "csv" or "binary". Defaults to "csv".
+        compress (bool, optional): Whether to gzip the output. Defaults to False.
+        chunkSize (int, optional): The number of rows generated at once. Defaults to 0x100000.
+        bufferSize (int, optional): The size of the write buffer in bytes. Defaults to 0x1000000.
+
+    Returns:
+        None.
+
+    File outputs:
+        outputPath: The exported seeds and state indices.
+    """
+    for column in columns:
+        if column not in exportColumnFormats:
+            raise ValueError("Unknown column {}, expected one of {}".format(column, ", ".join(exportColumnFormats)))
+    if fileFormat not in ("csv", "binary"):
+        raise ValueError("Unknown file format {}, expected csv or binary".format(fileFormat))
+
+    rowStruct = struct.Struct("<" + "".join(exportColumnFormats[column] for column in columns))
+    lineFormat = ",".join("{}" for column in columns) + "\n"
+
+    with open(outputPath, "wb", buffering = bufferSize) as rawFID:
+        fid = gzip.GzipFile(fileobj = rawFID, mode = "wb") if compress else rawFID
+        try:
+            if fileFormat == "csv":
+                fid.write((",".join(columns) + "\n").encode("utf-8"))
+
+            for chunkStart, seeds in seedChunks(microsMin, microsMax, chunkSize):
+                chunkColumns = {"seed": seeds}
+                if "micros" in columns:
+                    chunkColumns["micros"] = range(chunkStart, chunkStart + len(seeds)) if np == None else \
+                        np.arange(chunkStart, chunkStart + len(seeds), dtype=np.uint64)
+                if "state" in columns:
+                    chunkColumns["state"] = seedToStateArray(seeds, chunkSize)
+
+                if fileFormat == "binary" and np != None:
+                    rows = np.empty(len(seeds), dtype=[(column, "<" + exportColumnFormats[column]) for column in columns])
+                    for column in columns:
+                        rows[column] = chunkColumns[column]
+                    fid.write(rows.tobytes())
+                elif fileFormat == "binary":
+                    fid.write(b"".join(rowStruct.pack(*row) for row in zip(*(chunkColumns[column] for column in columns))))
+                else:
+                    columnLists = [list(chunkColumns[column]) if np == None else chunkColumns[column].tolist() for column in columns]
+                    fid.write("".join(lineFormat.format(*row) for row in zip(*columnLists)).encode("utf-8"))
+        finally:
+            if compress:
+                fid.close()
 
 def matchSeed(seedToMatch, startMicros, searchSizeLimit = 10000000):
     """
@@ -133,77 +549,874 @@ def matchSeed(seedToMatch, startMicros, searchSizeLimit = 10000000):
     Returns:
         int: Returns the micros of the earliest matching seed. If no seed is found, returns -1.
     """
-    for i in range(startMicros, startMicros + searchSizeLimit):
-        if randomizeMicrosSeed(i) == seedToMatch:
-            return i
+    microsList = seedToMicros(seedToMatch, startMicros, 1, searchSizeLimit)
+    if len(microsList) == 0:
+        return -1
+    return microsList[0]
+
+# The number of processes matchState() uses when none is given.
+# Set this above 1 in the interactive session to spread wide searches, such as the ones in mergingProcess(), across cores.
+searchProcesses = 1
+
+def matchState(stateToMatch, startMicros, searchSizeLimit = 10000000, processes = None):
+    """
+    Finds the next microsecond value with a state index that matches stateToMatch starting with the given value of startMicros.
+    If a state index file was loaded with loadStateIndex() and covers startMicros, it is used instead of checking every value.
+
+    Args:
+        stateToMatch (int): The state index that is to be matched.
+        startMicros (int): The minimum value of microseconds to check.
+        searchSizeLimit (int, optional): The maximum number of states to check. Defaults to 10000000.
+        processes (int, optional): The number of processes to search with. Defaults to None, in which case searchProcesses is used.
+
+    Returns:
+        int: Returns the micros of the earliest matching state. If no state is found, returns -1.
+    """
+    stopMicros = startMicros + searchSizeLimit
+
+    if _stateIndex != None and _stateIndex.covers(startMicros):
+        micros = _stateIndex.nextMatch(stateToMatch, startMicros, stopMicros)
+        if micros != -1:
+            return micros
+        # Only the part of the search past the end of the index still needs to be checked
+        startMicros = max(startMicros, _stateIndex.baseMicros + _stateIndex.windowSize)
+
+    if processes == None:
+        processes = searchProcesses
+
+    if processes > 1:
+        return parallelScan(_scanStates, stateToMatch, startMicros, stopMicros, processes)
+    return _scanStates(stateToMatch, startMicros, stopMicros)
+
+def _scanStates(stateToMatch, startMicros, stopMicros):
+    """
+    Returns the earliest micros from startMicros up to but not including stopMicros with the given state index, or -1 if there isn't one.
+    """
+    for chunkStart, states in stateChunks(startMicros, stopMicros):
+        if _scanStopped(startMicros):
+            return -1
+        index = _firstIndex(states, stateToMatch)
+        if index != -1:
+            return chunkStart + index
     return -1
 
-def matchState(stateToMatch, startMicros, searchSizeLimit = 10000000):
+def parallelScan(scanFunction, target, startMicros, stopMicros, processes = None, chunkSize = None):
     """
-    Finds the next microsecond value with a seed that matches seedToMatch starting with the given value of startMicros.
+    Splits a search from startMicros up to but not including stopMicros into chunks and searches them across a process pool.
+    The chunks are checked in order, so the result is always the earliest match, the same as a single process search.
+    Once a chunk has a match, every later chunk that hasn't started yet is cancelled, and the ones still running are told to stop.
+    The pool is kept between calls, see shutdownSearchProcesses().
 
     Args:
-        seedToMatch (int): The seed that is to be matched.
+        scanFunction (function): A module-level function taking (target, startMicros, stopMicros) and returning
+                                 the earliest matching micros in that range or -1, such as _scanStates.
+                                 It should return early once _scanStopped(startMicros) is True.
+        target (int): The value that is to be matched, passed on to scanFunction.
         startMicros (int): The minimum value of microseconds to check.
-        searchSizeLimit (int, optional): The maximum number of seeds to check. Defaults to 10000000.
+        stopMicros (int): The value of microseconds to stop before.
+        processes (int, optional): The number of processes. Defaults to None, in which case the number of CPUs is used.
+        chunkSize (int, optional): The number of micros per chunk. Defaults to None, in which case the range is split into
+                                   4 chunks per process, with at least 0x10000 micros per chunk.
 
     Returns:
-        int: Returns the micros of the earliest matching seed. If no seed is found, returns -1.
+        int: The micros of the earliest match. If no match is found, returns -1.
     """
-    for i in range(startMicros, startMicros + searchSizeLimit):
-        if randomizeMicrosState(i) == stateToMatch:
-            return i
+    if processes == None:
+        processes = os.cpu_count()
+    if chunkSize == None:
+        chunkSize = max(0x10000, -(-(stopMicros - startMicros) // (processes * 4)))
+
+    executor = _searchPool(processes)
+    _searchStop.value = 0xFFFFFFFFFFFFFFFF # Nothing found yet
+
+    chunkStarts = iter(range(startMicros, stopMicros, chunkSize))
+    # Only keep a couple of chunks per process queued so that a match doesn't leave a long queue behind it
+    pending = deque()
+    try:
+        for chunkStart in islice(chunkStarts, 2 * processes):
+            pending.append(executor.submit(scanFunction, target, chunkStart, min(chunkStart + chunkSize, stopMicros)))
+
+        while len(pending) > 0:
+            micros = pending.popleft().result()
+            if micros != -1:
+                return micros # Every earlier chunk has already come back without a match
+            for chunkStart in islice(chunkStarts, 1):
+                pending.append(executor.submit(scanFunction, target, chunkStart, min(chunkStart + chunkSize, stopMicros)))
+    except BaseException:
+        shutdownSearchProcesses() # The pool may be broken, so start a new one next time
+        raise
+    finally:
+        # Cancel the chunks that haven't started, tell the running ones to stop and wait for them,
+        # so they don't carry on into the next search
+        for future in pending:
+            future.cancel()
+        _searchStop.value = 0
+        wait(pending)
+
     return -1
 
-def findRepeats(startMicros = 0, limit = 1000000):
+# The process pool parallelScan() keeps between calls, its number of processes,
+# and the shared micros the chunks of the current search stop at once an earlier match is found
+_searchExecutor = None
+_searchExecutorProcesses = None
+_searchStop = None
+
+# The stop micros as seen from inside a search process
+_scanStop = None
+
+def _searchPool(processes):
+    """
+    Returns the process pool for parallelScan(), starting a new one if there isn't one with the given number of processes.
+    """
+    global _searchExecutor, _searchExecutorProcesses, _searchStop
+
+    if _searchExecutor == None or _searchExecutorProcesses != processes:
+        shutdownSearchProcesses()
+        _searchStop = multiprocessing.Value("Q", 0)
+        _searchExecutor = ProcessPoolExecutor(processes, initializer = _initSearchProcess, initargs = (_searchStop,))
+        _searchExecutorProcesses = processes
+    return _searchExecutor
+
+def _initSearchProcess(searchStop):
+    """
+    Runs in each search process when it starts, keeping the shared stop micros.
+    """
+    global _scanStop
+    _scanStop = searchStop
+
+def _scanStopped(startMicros):
+    """
+    Returns whether a parallel search has already found a match before startMicros, so a scan from startMicros can stop.
+    Always False outside of a search process.
+    """
+    return _scanStop != None and _scanStop.value <= startMicros
+
+def shutdownSearchProcesses():
+    """
+    Stops the process pool parallelScan() keeps between calls. A new one is started by the next parallel search.
+
+    Returns:
+        None.
     """
-    Searches for a repeated run of RNG seeds starting from startMicros.
+    global _searchExecutor, _searchExecutorProcesses
+
+    if _searchExecutor != None:
+        _searchExecutor.shutdown(wait=True, cancel_futures=True)
+    _searchExecutor = None
+    _searchExecutorProcesses = None
+
+class StateIndex:
+    """
+    An index of the micros where each RNG state index occurs within a window of microseconds.
+    The offsets from baseMicros are grouped by state index and sorted, so finding the next match is a binary search.
+
+    File format (little-endian):
+        header: b"UTSI", format version (uint32), baseMicros (uint64), windowSize (uint64)
+        bucket starts: 65537 uint32 values, where the offsets of state s are offsets[starts[s]:starts[s + 1]]
+        offsets: windowSize uint32 values
+
+    Attributes:
+        baseMicros (int): The first microsecond value in the window.
+        windowSize (int): The number of microsecond values in the window.
+        bucketStarts (array): The start of each state index's offsets, with a final entry equal to windowSize.
+        offsets (array): The offsets from baseMicros, grouped by state index and sorted within each group.
+    """
+    fileMagic = b"UTSI"
+    fileVersion = 1
+    headerFormat = "<4sIQQ"
+
+    def __init__(self, baseMicros, windowSize, bucketStarts, offsets):
+        self.baseMicros = baseMicros
+        self.windowSize = windowSize
+        self.bucketStarts = bucketStarts
+        self.offsets = offsets
+
+    @classmethod
+    def build(cls, baseMicros, windowSize = 10000000):
+        """
+        Computes the state index of every microsecond value in the window and sorts the offsets by state index.
+
+        Args:
+            baseMicros (int): The first microsecond value in the window.
+            windowSize (int, optional): The number of microsecond values in the window. Defaults to 10000000.
+
+        Returns:
+            StateIndex: The new index.
+        """
+        if windowSize <= 0 or windowSize > 0xFFFFFFFF:
+            raise ValueError("windowSize must be between 1 and 0xFFFFFFFF")
+
+        if np != None:
+            states = randomizeMicrosStateArray((baseMicros, baseMicros + windowSize))
+            bucketStarts = array("I", [0])
+            bucketStarts.extend(np.cumsum(np.bincount(states, minlength=0x10000)).tolist())
+            offsets = array("I")
+            offsets.frombytes(np.argsort(states, kind="stable").astype(np.uint32).tobytes())
+            return cls(baseMicros, windowSize, bucketStarts, offsets)
+
+        states = randomizeMicrosStateArray((baseMicros, baseMicros + windowSize))
+
+        # Counting sort, which keeps the offsets of each state in increasing order
+        counts = [0] * 0x10000
+        for state in states:
+            counts[state] += 1
+        bucketStarts = array("I", [0] * 0x10001)
+        for state in range(0x10000):
+            bucketStarts[state + 1] = bucketStarts[state] + counts[state]
+
+        positions = list(bucketStarts[:0x10000])
+        offsets = array("I", bytes(4 * windowSize))
+        for offset, state in enumerate(states):
+            offsets[positions[state]] = offset
+            positions[state] += 1
+
+        return cls(baseMicros, windowSize, bucketStarts, offsets)
+
+    @classmethod
+    def load(cls, filePath):
+        """
+        Reads an index from a file written by save().
+
+        Args:
+            filePath (str): Path to the index file.
+
+        Returns:
+            StateIndex: The loaded index.
+        """
+        with open(filePath, "rb") as fid:
+            header = fid.read(struct.calcsize(cls.headerFormat))
+            magic, version, baseMicros, windowSize = struct.unpack(cls.headerFormat, header)
+            if magic != cls.fileMagic or version != cls.fileVersion:
+                raise ValueError("{} is not a version {} state index file".format(filePath, cls.fileVersion))
+
+            bucketStarts = array("I")
+            bucketStarts.fromfile(fid, 0x10001)
+            offsets = array("I")
+            offsets.fromfile(fid, windowSize)
+
+        if sys.byteorder == "big":
+            bucketStarts.byteswap()
+            offsets.byteswap()
+
+        return cls(baseMicros, windowSize, bucketStarts, offsets)
+
+    def save(self, filePath):
+        """
+        Writes the index to a file that can be read back with load().
+
+        Args:
+            filePath (str): Path to the index file. Will be overwritten if it exists.
+
+        Returns:
+            None.
+        """
+        bucketStarts = array("I", self.bucketStarts)
+        offsets = array("I", self.offsets)
+        if sys.byteorder == "big":
+            bucketStarts.byteswap()
+            offsets.byteswap()
+
+        with open(filePath, "wb") as fid:
+            fid.write(struct.pack(self.headerFormat, self.fileMagic, self.fileVersion, self.baseMicros, self.windowSize))
+            bucketStarts.tofile(fid)
+            offsets.tofile(fid)
+
+    def covers(self, micros):
+        """
+        Returns whether the given microsecond value is inside the window.
+        """
+        return self.baseMicros <= micros < self.baseMicros + self.windowSize
+
+    def nextMatch(self, stateToMatch, startMicros, stopMicros):
+        """
+        Finds the earliest microsecond value in the window, from startMicros up to but not including stopMicros, with the given state index.
+
+        Args:
+            stateToMatch (int): The state index that is to be matched.
+            startMicros (int): The minimum value of microseconds to check.
+            stopMicros (int): The value of microseconds to stop before.
+
+        Returns:
+            int: The micros of the earliest matching state. If the window has no match in the range, returns -1.
+        """
+        bucketStart = self.bucketStarts[stateToMatch]
+        bucketStop = self.bucketStarts[stateToMatch + 1]
+        position = bisect_left(self.offsets, startMicros - self.baseMicros, bucketStart, bucketStop)
+        if position < bucketStop and self.baseMicros + self.offsets[position] < stopMicros:
+            return self.baseMicros + self.offsets[position]
+        return -1
+
+    def stridedMatches(self, stateToMatch, startMicros, stopMicros, stride, phase = 0, count = 1):
+        """
+        Finds the earliest microsecond values in the window, from startMicros up to but not including stopMicros,
+        with the given state index that are on the grid phase + floor(k * stride) of matchStateStrided().
+
+        Args:
+            stateToMatch (int): The state index that is to be matched.
+            startMicros (int): The minimum value of microseconds to check.
+            stopMicros (int): The value of microseconds to stop before.
+            stride (Fraction): The spacing between checked micros.
+            phase (int, optional): A microsecond value on the grid of checked micros. Defaults to 0.
+            count (int, optional): The maximum number of matches to return. Defaults to 1.
+
+        Returns:
+            list: The micros of the earliest matches, nearest first.
+        """
+        bucketStop = self.bucketStarts[stateToMatch + 1]
+        position = bisect_left(self.offsets, startMicros - self.baseMicros, self.bucketStarts[stateToMatch], bucketStop)
+
+        microsList = []
+        while position < bucketStop and len(microsList) < count:
+            micros = self.baseMicros + self.offsets[position]
+            if micros >= stopMicros:
+                break
+            if _onStrideGrid(micros, stride, phase):
+                microsList += [micros]
+            position += 1
+
+        return microsList
+
+# The state index used by matchState(), set with loadStateIndex()
+_stateIndex = None
+
+def buildStateIndex(baseMicros, windowSize = 10000000, filePath = "stateIndex.bin"):
+    """
+    Builds a state index for the given window, saves it, and loads it for use by matchState().
+    Use a baseMicros a little before the start time of the file being worked on so that matchState() calls land inside the window.
+
+    Args:
+        baseMicros (int): The first microsecond value in the window.
+        windowSize (int, optional): The number of microsecond values in the window. Defaults to 10000000.
+        filePath (str, optional): Path to save the index to. Defaults to "stateIndex.bin". If None, the index is not saved.
+
+    Returns:
+        StateIndex: The new index.
+
+    File outputs:
+        filePath: The index file, which can be loaded again in a later session with loadStateIndex().
+    """
+    global _stateIndex
+
+    _stateIndex = StateIndex.build(baseMicros, windowSize)
+    if filePath != None:
+        _stateIndex.save(filePath)
+
+    return _stateIndex
+
+def loadStateIndex(filePath = "stateIndex.bin"):
+    """
+    Loads a state index file saved by buildStateIndex() for use by matchState().
+
+    Args:
+        filePath (str, optional): Path to the index file. Defaults to "stateIndex.bin". If None, the loaded index is removed.
+
+    Returns:
+        StateIndex: The loaded index, or None if filePath is None.
+    """
+    global _stateIndex
+
+    if filePath == None:
+        _stateIndex = None
+    else:
+        _stateIndex = StateIndex.load(filePath)
+
+    return _stateIndex
+
+# The version of the formulas in randomizeMicrosSeed() and seedToState(), recorded in seed table files.
+# Increase this if the formulas change so that old tables are no longer used.
+seedFormulaVersion = 1
+
+class SeedTable:
+    """
+    A precomputed table of the seed and state index of every microsecond value in a range, read from disk with mmap.
+    A table written once can be reused by every later session, and only the pages that are used get read.
+
+    File format (little-endian, fixed width):
+        header: b"UTLT", file version (uint32), formula version (uint32), baseMicros (uint64), count (uint64)
+        seeds: count uint32 values, the seed of baseMicros + i
+        states: count uint16 values, the state index of baseMicros + i
+
+    Attributes:
+        baseMicros (int): The first microsecond value in the table.
+        count (int): The number of microsecond values in the table.
+        seeds (numpy.ndarray or memoryview): The seeds, indexed by micros - baseMicros.
+        states (numpy.ndarray or memoryview): The state indices, indexed by micros - baseMicros.
+    """
+    fileMagic = b"UTLT"
+    fileVersion = 1
+    headerFormat = "<4sIIQQ"
+
+    def __init__(self, filePath):
+        """
+        Opens a table file written by SeedTable.build().
+
+        Args:
+            filePath (str): Path to the table file.
+        """
+        with open(filePath, "rb") as fid:
+            header = fid.read(struct.calcsize(self.headerFormat))
+            magic, version, formulaVersion, self.baseMicros, self.count = struct.unpack(self.headerFormat, header)
+            if magic != self.fileMagic or version != self.fileVersion:
+                raise ValueError("{} is not a version {} seed table file".format(filePath, self.fileVersion))
+            if formulaVersion != seedFormulaVersion:
+                raise ValueError("{} was built with formula version {}, but the current version is {}".format(filePath, formulaVersion, seedFormulaVersion))
+            self._map = mmap.mmap(fid.fileno(), 0, access = mmap.ACCESS_READ)
+
+        seedsOffset = len(header)
+        statesOffset = seedsOffset + 4 * self.count
+        if np != None:
+            self.seeds = np.frombuffer(self._map, dtype="<u4", count=self.count, offset=seedsOffset)
+            self.states = np.frombuffer(self._map, dtype="<u2", count=self.count, offset=statesOffset)
+        elif sys.byteorder == "little":
+            self._mapView = memoryview(self._map)
+            self.seeds = self._mapView[seedsOffset:statesOffset].cast("I")
+            self.states = self._mapView[statesOffset:statesOffset + 2 * self.count].cast("H")
+        else:
+            self._map.close()
+            raise ValueError("Seed tables need NumPy on big-endian machines")
+
+    @classmethod
+    def build(cls, baseMicros, count, filePath = "seedTable.bin", chunkSize = 0x100000):
+        """
+        Computes the seeds and state indices for count micros starting at baseMicros and writes them to a table file, one chunk at a time.
+
+        Args:
+            baseMicros (int): The first microsecond value in the table.
+            count (int): The number of microsecond values in the table.
+            filePath (str, optional): Path to the table file. Defaults to "seedTable.bin". Will be overwritten if it exists.
+            chunkSize (int, optional): The number of values computed at once. Defaults to 0x100000.
+
+        Returns:
+            SeedTable: The new table, opened.
+        """
+        headerSize = struct.calcsize(cls.headerFormat)
+        with open(filePath, "wb") as fid:
+            fid.write(struct.pack(cls.headerFormat, cls.fileMagic, cls.fileVersion, seedFormulaVersion, baseMicros, count))
+            for chunkStart in range(baseMicros, baseMicros + count, chunkSize):
+                seeds = randomizeMicrosSeedArray((chunkStart, min(chunkStart + chunkSize, baseMicros + count)), chunkSize)
+                states = seedToStateArray(seeds, chunkSize)
+                if sys.byteorder == "big" and np != None:
+                    seeds = seeds.byteswap()
+                    states = states.byteswap()
+                elif sys.byteorder == "big":
+                    seeds.byteswap() # array swaps in place
+                    states.byteswap()
+
+                # The seeds and states are stored as separate columns, so each chunk goes in two places
+                fid.seek(headerSize + 4 * (chunkStart - baseMicros))
+                fid.write(seeds.tobytes())
+                fid.seek(headerSize + 4 * count + 2 * (chunkStart - baseMicros))
+                fid.write(states.tobytes())
+
+        return cls(filePath)
+
+    def covers(self, micros):
+        """
+        Returns whether the given microsecond value is in the table.
+        """
+        return self.baseMicros <= micros < self.baseMicros + self.count
+
+    def stateRange(self, startMicros, stopMicros):
+        """
+        Returns the state indices from startMicros up to but not including stopMicros, like randomizeMicrosStateArray((startMicros, stopMicros)).
+        The part inside the table is read from it and the rest is computed.
+
+        Args:
+            startMicros (int): The first microsecond value.
+            stopMicros (int): The microsecond value to stop before.
+
+        Returns:
+            numpy.ndarray or array: The uint16 state indices.
+        """
+        tableStart = min(max(startMicros, self.baseMicros), stopMicros)
+        tableStop = max(min(stopMicros, self.baseMicros + self.count), tableStart)
+
+        parts = [randomizeMicrosStateArray((startMicros, tableStart))]
+        if np == None:
+            tableStates = array("H")
+            tableStates.frombytes(self.states[tableStart - self.baseMicros:tableStop - self.baseMicros].tobytes())
+            parts += [tableStates]
+        else:
+            parts += [self.states[tableStart - self.baseMicros:tableStop - self.baseMicros]]
+        parts += [randomizeMicrosStateArray((tableStop, stopMicros))]
+
+        if np == None:
+            return parts[0] + parts[1] + parts[2]
+        if len(parts[0]) == 0 and len(parts[2]) == 0:
+            return parts[1]
+        return np.concatenate(parts)
+
+    def close(self):
+        """
+        Closes the table file. The table can't be used afterwards.
+        """
+        if isinstance(self.seeds, memoryview): # The map can't be closed while views of it are still exported
+            self.seeds.release()
+            self.states.release()
+            self._mapView.release()
+        self.seeds = None
+        self.states = None
+        self._map.close()
+
+# The seed table used by randomizeMicrosState(), stateChunks(), and everything built on them, set with openSeedTable()
+_seedTable = None
+
+def buildSeedTable(baseMicros, count, filePath = "seedTable.bin"):
+    """
+    Builds a seed table file for count micros starting at baseMicros and opens it for use by randomizeMicrosState() and matchState().
+    Lookups outside of the table fall back to computing the values.
+
+    Args:
+        baseMicros (int): The first microsecond value in the table.
+        count (int): The number of microsecond values in the table.
+        filePath (str, optional): Path to the table file. Defaults to "seedTable.bin". Will be overwritten if it exists.
+
+    Returns:
+        SeedTable: The opened table.
+
+    File outputs:
+        filePath: The table file, which can be opened again in a later session with openSeedTable().
+    """
+    closeSeedTable()
+    return openSeedTable(SeedTable.build(baseMicros, count, filePath))
+
+def openSeedTable(filePath = "seedTable.bin"):
+    """
+    Opens a seed table file for use by randomizeMicrosState() and matchState(), closing any table that was already open.
+
+    Args:
+        filePath (str or SeedTable, optional): Path to the table file, or an opened table. Defaults to "seedTable.bin".
+
+    Returns:
+        SeedTable: The opened table.
+    """
+    global _seedTable
+
+    if not isinstance(filePath, SeedTable):
+        filePath = SeedTable(filePath)
+    if _seedTable != None and _seedTable is not filePath:
+        _seedTable.close()
+    _seedTable = filePath
+
+    return _seedTable
+
+def closeSeedTable():
+    """
+    Closes the open seed table, if there is one, so that every value is computed again.
+
+    Returns:
+        None.
+    """
+    global _seedTable
+
+    if _seedTable != None:
+        _seedTable.close()
+    _seedTable = None
+
+def findRepeats(startMicros = 0, limit = 1000000, minLength = 2, verbose = False):
+    """
+    Searches for the longest repeated run of RNG states starting from startMicros,
+    meaning the longest sequence of consecutive state indices that appears twice within the searched micros.
+    The two copies may overlap. This uses a binary search on the run length with rolling hashes, so it takes n log^2 n time.
 
     Args:
         startMicros (int, optional): The minimum value of microseconds to check. Defaults to 0.
-        limit (int, optional): The maximum value of micros to check. Defaults to 1000000.
+        limit (int, optional): The number of micros to check. Defaults to 1000000.
+        minLength (int, optional): The shortest run length that counts as a repeat. Defaults to 2.
+        verbose (bool, optional): Whether to print the progress of the binary search. Defaults to False.
 
     Returns:
-        int, int: Returns the two millisecond values where seeds start repeating. If no repeat is found, returns 0, 0.
+        int, int: Returns the two micros values where the repeated run starts, with the earliest possible second copy.
+                  If no repeat is found, returns 0, 0.
+    """
+    states = randomizeMicrosStateArray((startMicros, startMicros + limit))
+    if np == None:
+        findRepeat = _findRepeatPython
+    else:
+        findRepeat = _findRepeatNumpy(states)
+
+    # Any run of a repeated run is also repeated, so the lengths with a repeat are exactly 0 up to the longest one
+    shortest = 0
+    longest = limit - 1
+    bestRepeat = None
+    while shortest < longest:
+        length = (shortest + longest + 1) // 2
+        repeat = findRepeat(states, length)
+        if verbose:
+            print("Length {}: {}".format(length, "no repeat" if repeat == None else "repeats at {} and {}".format(startMicros + repeat[0], startMicros + repeat[1])))
+        if repeat == None:
+            longest = length - 1
+        else:
+            shortest = length
+            bestRepeat = repeat
+
+    if bestRepeat == None or shortest < minLength:
+        return 0, 0
+    return startMicros + bestRepeat[0], startMicros + bestRepeat[1]
+
+def _findRepeatPython(states, length):
     """
-    j = 0
-    runningList = []
-    firstMatch = 0
-    currentlyMatching = 0
-    maxPercent = 0
-    k = startMicros
+    Returns the positions (first, second) of a run of the given length that appears twice in states, with the smallest second position,
+    or None if there isn't one. This is the pure Python version using a rolling hash in a dict.
+    """
+    modulus = 0x1FFFFFFFFFFFFFFF # A Mersenne prime
+    base = 0x10001
+    topPower = pow(base, length - 1, modulus)
+
+    firstPositions = {}
+    runHash = 0
+    for position in range(len(states)):
+        if position >= length:
+            runHash = (runHash - states[position - length] * topPower) % modulus
+        runHash = (runHash * base + states[position]) % modulus
+        if position < length - 1:
+            continue
 
-    while k < startMicros + limit:
-        for i in range(k, k + limit):
-            runningList += [randomizeMicrosState(i)]
+        runStart = position - length + 1
+        firstPosition = firstPositions.setdefault(runHash, runStart)
+        if firstPosition != runStart and states[firstPosition:firstPosition + length] == states[runStart:runStart + length]:
+            return firstPosition, runStart
 
-            if currentlyMatching == 0:
-                if i != k and randomizeMicrosState(i) == runningList[j]: # Found a match
-                    firstMatch = i
-                    currentlyMatching = 1
+    return None
 
-            elif currentlyMatching == 1:
-                j += 1
+def _findRepeatNumpy(states):
+    """
+    Returns a function like _findRepeatPython() that uses polynomial hashes modulo 2^64, computed for every run at once from prefix sums.
+    The prefix sums only depend on the states, so they are shared between every length checked.
+    """
+    base = np.uint64(0x9E3779B97F4A7C15) # Odd, so it has an inverse modulo 2^64
+    inverseBase = np.uint64(pow(0x9E3779B97F4A7C15, -1, 0x10000000000000000))
+    values = states.astype(np.uint64) + 1
+
+    with np.errstate(over="ignore"):
+        powers = np.full(len(values), base, dtype=np.uint64)
+        powers[0] = 1
+        powers = np.cumprod(powers, dtype=np.uint64)
+        inversePowers = np.full(len(values), inverseBase, dtype=np.uint64)
+        inversePowers[0] = 1
+        inversePowers = np.cumprod(inversePowers, dtype=np.uint64)
+        prefixSums = np.concatenate(([np.uint64(0)], np.cumsum(values * powers, dtype=np.uint64)))
+
+    def findRepeat(states, length):
+        with np.errstate(over="ignore"):
+            runHashes = (prefixSums[length:] - prefixSums[:-length]) * inversePowers[:len(prefixSums) - length]
+
+        order = np.argsort(runHashes, kind="stable") # Equal hashes stay in order of position
+        sortedHashes = runHashes[order]
+        sameAsPrevious = np.flatnonzero(sortedHashes[1:] == sortedHashes[:-1]) + 1
+        if len(sameAsPrevious) == 0:
+            return None
+
+        # Pair every later copy with the first position of its group of equal hashes
+        groupStarts = np.flatnonzero(np.concatenate(([True], sortedHashes[1:] != sortedHashes[:-1])))
+        groupOfEach = np.searchsorted(groupStarts, sameAsPrevious, side="right") - 1
+        firstPositions = order[groupStarts[groupOfEach]]
+        secondPositions = order[sameAsPrevious]
+
+        for pair in np.argsort(secondPositions, kind="stable").tolist():
+            first = int(firstPositions[pair])
+            second = int(secondPositions[pair])
+            if np.array_equal(states[first:first + length], states[second:second + length]): # Rule out hash collisions
+                return first, second
+        return None
+
+    return findRepeat
+
+class StateTimeline:
+    """
+    A run-length encoded timeline of RNG state indices over a range of microseconds.
+    Each run is a stretch of consecutive micros with the same state index, stored in three compact arrays.
+    Runs shorter than minLength are left out, which keeps the timeline small when only long runs are of interest.
+
+    File format (little-endian):
+        header: b"UTST", format version (uint32), startMicros (uint64), stopMicros (uint64), minLength (uint32), run count (uint64)
+        run starts: uint64 per run
+        run lengths: uint32 per run
+        run states: uint16 per run
+
+    Attributes:
+        startMicros (int): The first microsecond value covered.
+        stopMicros (int): The microsecond value the timeline currently stops before.
+        minLength (int): The shortest run that is kept.
+        runStarts (array): The micros where each kept run starts, in increasing order.
+        runLengths (array): The length of each kept run in micros.
+        runStates (array): The state index of each kept run.
+    """
+    fileMagic = b"UTST"
+    fileVersion = 1
+    headerFormat = "<4sIQQIQ"
+
+    def __init__(self, startMicros, minLength = 1):
+        self.startMicros = startMicros
+        self.stopMicros = startMicros
+        self.minLength = minLength
+        self.runStarts = array("Q")
+        self.runLengths = array("I")
+        self.runStates = array("H")
+        self._tail = None # The last run, which can still grow: [start, length, state, whether it is stored in the arrays]
+
+    def extend(self, stopMicros):
+        """
+        Adds the runs from the current end of the timeline up to but not including stopMicros.
+
+        Args:
+            stopMicros (int): The microsecond value to stop before.
+
+        Returns:
+            StateTimeline: The timeline itself.
+        """
+        for chunkStart, states in stateChunks(self.stopMicros, stopMicros):
+            chunkRunStarts, chunkRunLengths = _stateRuns(states)
+            if np == None:
+                chunkRunStates = [states[runStart] for runStart in chunkRunStarts]
+                chunkRunStarts = [chunkStart + runStart for runStart in chunkRunStarts]
+            else:
+                chunkRunStates = states[chunkRunStarts]
+                chunkRunStarts = chunkStart + chunkRunStarts.astype(np.uint64)
+                chunkRunLengths = chunkRunLengths.astype(np.uint32)
+
+            # The first run continues the last run of the previous chunk if the state is the same
+            if self._tail != None and chunkRunStates[0] == self._tail[2]:
+                if self._tail[3]:
+                    self.runStarts.pop()
+                    self.runLengths.pop()
+                    self.runStates.pop()
+                chunkRunStarts[0] = self._tail[0]
+                chunkRunLengths[0] += self._tail[1]
+
+            if np == None:
+                for runStart, runLength, runState in zip(chunkRunStarts, chunkRunLengths, chunkRunStates):
+                    if runLength >= self.minLength:
+                        self.runStarts.append(runStart)
+                        self.runLengths.append(runLength)
+                        self.runStates.append(runState)
+            else:
+                kept = chunkRunLengths >= self.minLength
+                self.runStarts.frombytes(chunkRunStarts[kept].tobytes())
+                self.runLengths.frombytes(chunkRunLengths[kept].tobytes())
+                self.runStates.frombytes(chunkRunStates[kept].tobytes())
+
+            self._tail = [int(chunkRunStarts[-1]), int(chunkRunLengths[-1]), int(chunkRunStates[-1]), int(chunkRunLengths[-1]) >= self.minLength]
+            self.stopMicros = chunkStart + len(states)
+
+        return self
+
+    @classmethod
+    def load(cls, filePath):
+        """
+        Reads a timeline from a file written by save(). The loaded timeline can be extended further.
+
+        Args:
+            filePath (str): Path to the timeline file.
+
+        Returns:
+            StateTimeline: The loaded timeline.
+        """
+        with open(filePath, "rb") as fid:
+            header = fid.read(struct.calcsize(cls.headerFormat))
+            magic, version, startMicros, stopMicros, minLength, runCount = struct.unpack(cls.headerFormat, header)
+            if magic != cls.fileMagic or version != cls.fileVersion:
+                raise ValueError("{} is not a version {} state timeline file".format(filePath, cls.fileVersion))
+
+            timeline = cls(startMicros, minLength)
+            timeline.runStarts.fromfile(fid, runCount)
+            timeline.runLengths.fromfile(fid, runCount)
+            timeline.runStates.fromfile(fid, runCount)
+
+        if sys.byteorder == "big":
+            timeline.runStarts.byteswap()
+            timeline.runLengths.byteswap()
+            timeline.runStates.byteswap()
+
+        timeline.stopMicros = stopMicros
+        if stopMicros > startMicros:
+            # The last run is rebuilt from the states just before the end so that extend() can carry it on
+            lastState = randomizeMicrosState(stopMicros - 1)
+            tailStart = stopMicros - 1
+            while tailStart > startMicros and randomizeMicrosState(tailStart - 1) == lastState:
+                tailStart -= 1
+            isStored = runCount > 0 and timeline.runStarts[-1] == tailStart
+            timeline._tail = [tailStart, stopMicros - tailStart, lastState, isStored]
+
+        return timeline
+
+    def save(self, filePath):
+        """
+        Writes the timeline to a file that can be read back with load().
+
+        Args:
+            filePath (str): Path to the timeline file. Will be overwritten if it exists.
+
+        Returns:
+            None.
+        """
+        runStarts = array("Q", self.runStarts)
+        runLengths = array("I", self.runLengths)
+        runStates = array("H", self.runStates)
+        if sys.byteorder == "big":
+            runStarts.byteswap()
+            runLengths.byteswap()
+            runStates.byteswap()
+
+        with open(filePath, "wb") as fid:
+            fid.write(struct.pack(self.headerFormat, self.fileMagic, self.fileVersion, self.startMicros, self.stopMicros, self.minLength, len(runStarts)))
+            runStarts.tofile(fid)
+            runLengths.tofile(fid)
+            runStates.tofile(fid)
+
+    def longestRun(self):
+        """
+        Returns the longest kept run, choosing the earliest one if there is a tie.
+
+        Returns:
+            tuple: (start micros, length, state index), or None if no run is kept.
+        """
+        if len(self.runLengths) == 0:
+            return None
+
+        if np == None:
+            index = max(range(len(self.runLengths)), key=self.runLengths.__getitem__)
+        else:
+            index = int(np.argmax(np.frombuffer(self.runLengths, dtype=np.uint32)))
+        return self.runStarts[index], self.runLengths[index], self.runStates[index]
 
-                if randomizeMicrosState(i) != runningList[j]: # Lost matching
-                    firstMatch = 0
-                    currentlyMatching = 0
-                    j = 0
+    def runsAtLeast(self, length):
+        """
+        Returns every kept run that is at least the given length, in order of start micros.
 
-                else:
-                    if j / firstMatch > maxPercent:
-                        maxPercent = j / (firstMatch - k)
-                        print("{} {:%}".format(i, maxPercent))
-
-                if j == firstMatch and currentlyMatching == 1: # Found a full match
-                    return i, firstMatch
-        k += 1
-        j = 0
-        runningList = []
-        firstMatch = 0
-        currentlyMatching = 0
-        maxPercent = 0
-    return 0, 0
+        Args:
+            length (int): The minimum run length.
+
+        Returns:
+            list: (start micros, length, state index) for each run.
+        """
+        if np == None:
+            indices = [index for index in range(len(self.runLengths)) if self.runLengths[index] >= length]
+        else:
+            indices = np.flatnonzero(np.frombuffer(self.runLengths, dtype=np.uint32) >= length).tolist()
+        return [(self.runStarts[index], self.runLengths[index], self.runStates[index]) for index in indices]
+
+    def runsNear(self, state, micros, radius):
+        """
+        Returns every kept run of the given state index that overlaps micros - radius up to micros + radius, in order of start micros.
+
+        Args:
+            state (int): The state index.
+            micros (int): The micros to search around.
+            radius (int): How far from micros to search, in micros.
+
+        Returns:
+            list: (start micros, length, state index) for each run.
+        """
+        # The run just before the window can still overlap it, so start one run earlier
+        firstIndex = max(bisect_left(self.runStarts, micros - radius) - 1, 0)
+        lastIndex = bisect_right(self.runStarts, micros + radius)
+
+        runs = []
+        for index in range(firstIndex, lastIndex):
+            if self.runStates[index] == state and self.runStarts[index] + self.runLengths[index] > micros - radius:
+                runs += [(self.runStarts[index], self.runLengths[index], self.runStates[index])]
+        return runs
 
 def findDuplicates(startMicros = 0, limit = 1000000):
     """
@@ -216,30 +1429,13 @@ def findDuplicates(startMicros = 0, limit = 1000000):
     Returns:
         int, int: Returns the number of repeats and the micros where the repeat happens.
     """
+    # Only runs of 2 or more are duplicates, so there's no need to keep the rest
+    longestRun = StateTimeline(startMicros, 2).extend(startMicros + limit).longestRun()
 
-    currentValue = randomizeMicrosState(startMicros)
-    duplicates = 1
-    duplicatesStart = startMicros
-    bestDuplicates = 1
-    bestDuplicatesStart = startMicros
-
-    for i in range(startMicros + 1, startMicros + limit):
-        if i % 10000000 == 0:
-            print(i, currentValue)
-        if randomizeMicrosState(i) == currentValue:
-            duplicates += 1
-            if duplicates > bestDuplicates:
-                bestDuplicates = duplicates
-                bestDuplicatesStart = duplicatesStart
-                print(bestDuplicates, bestDuplicatesStart)
-        else:
-            duplicates = 1
-            duplicatesStart = i
-        currentValue = randomizeMicrosState(i)
-    if bestDuplicates == 1:
+    if longestRun == None:
         return "No duplicates found out of {} seeds checked".format(limit)
     else:
-        return"{0} duplicates starting at {1} microseconds out of {2} seeds checked".format(bestDuplicates, bestDuplicatesStart, limit)
+        return"{0} duplicates starting at {1} microseconds out of {2} seeds checked".format(longestRun[1], longestRun[0], limit)
 
 def matchSeed_ms(seedToMatch, startMicros, searchSizeLimit = 100000000):
     """
@@ -254,125 +1450,364 @@ def matchSeed_ms(seedToMatch, startMicros, searchSizeLimit = 100000000):
     Returns:
         int: Returns the micros of the earliest matching seed that is a multiple of 1000. If no seed is found, returns -1.
     """
-    for i in range(startMicros, startMicros + searchSizeLimit):
-        if i % 1000 != 0:
-            continue
-
-        if randomizeMicrosState(i) == seedToMatch:
-            return i
-    return -1
+    microsList = matchSeedStrided(seedToMatch, startMicros, 1000, 0, searchSizeLimit)
+    if len(microsList) == 0:
+        return -1
+    return microsList[0]
 
-def openltm(filePath):
+def matchStateStrided(stateToMatch, startMicros, stride = 1000, phase = 0, searchSizeLimit = 100000000, count = 1, nearest = False):
     """
-    Opens each of the files in the ltm file and returns their file IDs. Run closeltm() on the output dict to close all of the open files.
+    Finds the next microsecond values with a state index that matches stateToMatch starting with the given value of startMicros,
+    only checking the micros phase + floor(k * stride) for whole numbers k.
+    For example, a stride of 1000 checks whole milliseconds, and a stride of Fraction(1000000, 60) with the start time
+    of a segment as the phase checks the frame boundaries of a 60 fps segment.
+    The part of the search inside the state index loaded with loadStateIndex() is looked up in the index, like matchState().
 
     Args:
-        filePath (str): The file path of the ltm file.
+        stateToMatch (int): The state index that is to be matched.
+        startMicros (int): The minimum value of microseconds to check, or the target micros if nearest is True.
+        stride (int or Fraction, optional): The spacing between checked micros. Defaults to 1000.
+        phase (int, optional): A microsecond value on the grid of checked micros. Defaults to 0.
+        searchSizeLimit (int, optional): The number of microseconds after startMicros to search. Defaults to 100000000.
+        count (int, optional): The maximum number of matches to return. Defaults to 1.
+        nearest (bool, optional): If True, micros up to searchSizeLimit before startMicros are searched as well,
+                                  and the matches closest to startMicros are returned, the earlier one first on a tie.
+                                  The search works outwards from startMicros, so it stops once the closest count are known.
+                                  Defaults to False.
 
     Returns:
-        dict: {filePath : [ltmFID, annotationsPath, configPath, editorPath, inputsPath]} A dictionary with the file path as the key
-              and a list of the ltm file id followed by the contents paths as the value
+        list: The micros of the earliest matches, nearest first. This can be shorter than count, or empty if no match is found.
     """
-    ltmFID = topen(filePath) # Open as a tarfile
-
-    dirPath = "__temp/" + filePath.removesuffix(".ltm")
+    stride = Fraction(stride)
+    if stride <= 0:
+        raise ValueError("stride must be positive")
 
-    ltmFID.extractall(dirPath + "/")
+    if not nearest:
+        return _stridedStateMatches(stateToMatch, startMicros, startMicros + searchSizeLimit, stride, phase, count)
 
-    annotationsPath = dirPath + "/" + "annotations.txt"
-    configPath = dirPath + "/" + "config.ini"
-    editorPath = dirPath + "/" + "editor.ini"
-    inputsPath = dirPath + "/" + "inputs"
-
-    return {filePath : [ltmFID, annotationsPath, configPath, editorPath, inputsPath]}
-
-def closeltm(fidDict, filesToClose = None, merge = False):
+    # Search rings on both sides of the target that double in width,
+    # until no micros left to search can be closer than the furthest of the count closest matches
+    microsList = []
+    distance = 0
+    width = 0x1000
+    while distance < searchSizeLimit:
+        width = min(width, searchSizeLimit - distance)
+        for ringStart, ringStop in ((max(startMicros - distance - width, 0), max(startMicros - distance, 0)),
+                                    (startMicros + distance, startMicros + distance + width)):
+            microsList += _stridedStateMatches(stateToMatch, ringStart, ringStop, stride, phase, ringStop - ringStart)
+        distance += width
+        width *= 2
+
+        microsList.sort(key = lambda micros: (abs(micros - startMicros), micros))
+        if len(microsList) >= count and abs(microsList[count - 1] - startMicros) < distance:
+            break
+
+    return microsList[:count]
+
+def matchSeedStrided(seedToMatch, startMicros, stride = 1000, phase = 0, searchSizeLimit = 100000000, count = 1, nearest = False):
     """
-    Closes each of the files in the supplied dict, using the format supplied by openltm().
-    Optionally takes a list of files to close, otherwise closes all files.
+    Finds the next microsecond values with a seed that matches seedToMatch starting with the given value of startMicros,
+    only checking the micros phase + floor(k * stride) for whole numbers k, like matchStateStrided().
+    Every micros with the seed is found directly with seedToMicros() and then checked against the grid, so nothing is scanned.
 
     Args:
-        fidDict (dict): Dictionary of format {filePath : [ltmFID, annotationsFID, configFID, editorFID, inputsFID]}.
-        filesToClose (list, optional): A list of file paths to be closed. Defaults to None, in which case all files in the dict are closed.
-        merge (dict or bool, optional): Whether or not to update the ltm file by merging the extracted files back together. {filepath: bool} or bool
+        seedToMatch (int): The seed that is to be matched.
+        startMicros (int): The minimum value of microseconds to check, or the target micros if nearest is True.
+        stride (int or Fraction, optional): The spacing between checked micros. Defaults to 1000.
+        phase (int, optional): A microsecond value on the grid of checked micros. Defaults to 0.
+        searchSizeLimit (int, optional): The number of microseconds after startMicros to search. Defaults to 100000000.
+        count (int, optional): The maximum number of matches to return. Defaults to 1.
+        nearest (bool, optional): If True, micros up to searchSizeLimit before startMicros are searched as well,
+                                  and the matches closest to startMicros are returned, the earlier one first on a tie.
+                                  Defaults to False.
 
     Returns:
-        dict: fidDict with the closed files removed.
+        list: The micros of the earliest matches, nearest first. This can be shorter than count, or empty if no match is found.
     """
-    if filesToClose == None:
-        filesToClose = list(fidDict.keys()) # If None, select all files in the dict
+    stride = Fraction(stride)
+    if stride <= 0:
+        raise ValueError("stride must be positive")
 
-    if merge == False:
-        merge = dict(zip(filesToClose, [False]))
-    elif merge == True:
-        merge = dict(zip(filesToClose, [True]))
+    searchStart = max(startMicros - searchSizeLimit, 0) if nearest else startMicros
+    searchSize = startMicros + searchSizeLimit - searchStart
+    microsList = [micros for micros in seedToMicros(seedToMatch, searchStart, searchSize, searchSize) if _onStrideGrid(micros, stride, phase)]
+    if nearest:
+        microsList.sort(key = lambda micros: (abs(micros - startMicros), micros))
 
-    for filePath in filesToClose:
-        if filePath in fidDict.keys(): # Silently ignore file paths that were already removed
-            [ltmFID, annotationsPath, configPath, editorPath, inputsPath] = fidDict[filePath]
+    return microsList[:count]
 
-            # # Close all inside files first
-            # annotationsFID.close()
-            # configFID.close()
-            # editorFID.close()
-            # inputsFID.close()
+def _stridedStateMatches(stateToMatch, startMicros, stopMicros, stride, phase, count):
+    """
+    Returns the earliest count micros on the grid phase + floor(k * stride) from startMicros up to but not including stopMicros
+    with the given state index. The part inside the loaded state index is looked up in it and the rest is computed.
+    """
+    segments = [(startMicros, stopMicros, False)]
+    if _stateIndex != None:
+        # Search the part before the index, then the index, then the part after it
+        indexStart = min(max(startMicros, _stateIndex.baseMicros), stopMicros)
+        indexStop = max(min(stopMicros, _stateIndex.baseMicros + _stateIndex.windowSize), indexStart)
+        segments = [(startMicros, indexStart, False), (indexStart, indexStop, True), (indexStop, stopMicros, False)]
 
-            # Then close the ltm file
-            ltmFID.close()
+    microsList = []
+    for segmentStart, segmentStop, indexed in segments:
+        if segmentStart >= segmentStop:
+            continue
+        if indexed:
+            microsList += _stateIndex.stridedMatches(stateToMatch, segmentStart, segmentStop, stride, phase, count - len(microsList))
+        else:
+            microsList += _scanStrided(stateToMatch, segmentStart, segmentStop, stride, phase, count - len(microsList))
+        if len(microsList) >= count:
+            break
 
-            # Merge the files into a new ltm if requested
-            if merge[filePath]:
+    return microsList
 
-                ltmFID = topen(filePath.removesuffix(".ltm"), "w:gz")
-                try:
-                    ltmFID.add(annotationsPath, arcname = "annotations.txt")
-                    os.remove(annotationsPath)
-                except FileNotFoundError:
-                    pass
-                try:
-                    ltmFID.add(configPath, arcname = "config.ini")
-                    os.remove(configPath)
-                except FileNotFoundError:
-                    pass
-                try:
-                    ltmFID.add(editorPath, arcname = "editor.ini")
-                    os.remove(editorPath)
-                except FileNotFoundError:
-                    pass
-                try:
-                    ltmFID.add(inputsPath, arcname = "inputs")
-                    os.remove(inputsPath)
-                except FileNotFoundError:
-                    pass
-                os.rmdir(inputsPath.removesuffix("/inputs"))
-                ltmFID.close()
-                os.remove(filePath)
-                os.rename(filePath.removesuffix(".ltm"), filePath)
-
-            # Otherwise delete the extracted files
-            else:
-                try:
-                    os.remove(annotationsPath)
-                except FileNotFoundError:
-                    pass
-                try:
-                    os.remove(configPath)
-                except FileNotFoundError:
-                    pass
-                try:
-                    os.remove(editorPath)
-                except FileNotFoundError:
-                    pass
-                try:
-                    os.remove(inputsPath)
-                except FileNotFoundError:
-                    pass
-                os.rmdir(inputsPath.removesuffix("/inputs"))
+def _onStrideGrid(micros, stride, phase):
+    """
+    Returns whether micros is phase + floor(k * stride) for a whole number k.
+    """
+    k = -((phase - micros) // stride) # The first point of the grid at or after micros
+    return phase + k * stride.numerator // stride.denominator == micros
+
+def _scanStrided(stateToMatch, startMicros, stopMicros, stride, phase, count):
+    """
+    Computes the state index of each micros phase + floor(k * stride) from startMicros up to but not including stopMicros,
+    and returns the earliest count of them matching stateToMatch.
+    """
+    # floor(k * stride) >= n is the same as k * stride >= n for whole numbers n, so the bounds on k are both ceilings
+    kStart = -((phase - startMicros) // stride)
+    kStop = -((phase - stopMicros) // stride)
+
+    microsList = []
+    for chunkStart in range(kStart, kStop, 0x10000):
+        micros = _stridedMicros(chunkStart, min(chunkStart + 0x10000, kStop), stride, phase)
+        states = randomizeMicrosStateArray(micros)
+        if np == None:
+            matchIndices = [index for index in range(len(states)) if states[index] == stateToMatch]
+        else:
+            matchIndices = np.flatnonzero(states == stateToMatch).tolist()
+        microsList += [int(micros[index]) for index in matchIndices[:count - len(microsList)]]
+        if len(microsList) >= count:
+            break
+
+    return microsList
 
-            # Remove the dict element
-            fidDict.pop(filePath)
+def _stridedMicros(kStart, kStop, stride, phase):
+    """
+    Returns the micros phase + floor(k * stride) for k from kStart up to but not including kStop,
+    as a uint64 NumPy array if NumPy is installed and the values fit, otherwise as a list.
+    """
+    if np != None and kStart >= 0 and phase >= 0 and kStop * stride.numerator < 0x8000000000000000:
+        k = np.arange(kStart, kStop, dtype=np.uint64)
+        return phase + k * stride.numerator // stride.denominator
+
+    return [phase + k * stride.numerator // stride.denominator for k in range(kStart, kStop)]
+
+class LtmArchive:
+    """
+    An .ltm file whose members (annotations.txt, config.ini, editor.ini, inputs) can be edited in place
+    and written back with one atomic write. The original file is decompressed once, in a single pass that copies
+    each member into memory, or into an anonymous temporary file for members larger than spoolSize so long movies
+    don't have to fit in memory. Saving compresses the members from those copies without reading the original file again.
+    Use it with a with statement to make sure the members are released.
+
+    Attributes:
+        filePath (str): The path of the .ltm file.
+        spoolSize (int): The size in bytes past which a member is kept in a temporary file instead of in memory.
+        members (dict): {name: file} The binary file object holding each member.
+    """
+    def __init__(self, filePath, spoolSize = 0x4000000):
+        """
+        Reads the members of an .ltm file.
+
+        Args:
+            filePath (str): The path of the .ltm file.
+            spoolSize (int, optional): The size in bytes past which a member is kept in a temporary file. Defaults to 0x4000000 (64 MiB).
+        """
+        self.filePath = filePath
+        self.spoolSize = spoolSize
+        self.members = {}
+        self._modified = set()
+        self._config = None
+        self._openSource(filePath)
+
+    def _openSource(self, filePath):
+        """
+        Reads the member headers and contents of filePath in archive order, in one pass through the gzip stream.
+        """
+        self._memberInfo = {}
+        with topen(filePath, "r|*") as source: # Stream mode, so the archive is only read forwards
+            for info in source:
+                if info.isfile():
+                    name = info.name.removeprefix("./")
+                    member = tempfile.SpooledTemporaryFile(max_size = self.spoolSize)
+                    shutil.copyfileobj(source.extractfile(info), member, 0x100000)
+                    self._memberInfo[name] = info
+                    self.members[name] = member
+
+    @property
+    def config(self):
+        """
+        LtmConfig: The parsed config.ini, parsed the first time it's used and shared by everything using this archive.
+        Changes are written to config.ini when the archive is saved, or before config.ini is opened directly.
+        """
+        if self._config == None:
+            self._config = LtmConfig(self)
+        return self._config
+
+    def names(self):
+        """
+        Returns the member names in the order they will be saved in.
+        """
+        return list(self._memberInfo) + [name for name in self.members if name not in self._memberInfo]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    @contextmanager
+    def open(self, name, mode = "r"):
+        """
+        Opens a member for use in a with statement, like the built-in open().
+        Text modes use UTF-8 without newline translation, so lines keep their original endings.
+        They work on a copy of the member in memory, so use the binary modes for large members like the inputs.
+
+        Args:
+            name (str): The member name, e.g. "inputs".
+            mode (str, optional): "r" or "rb" to read, "w" or "wb" to replace the member once the with statement ends
+                                  without an error, or "r+b" to edit the member in place. Defaults to "r".
+
+        Yields:
+            file: The member file object, positioned at the start.
+        """
+        if mode not in ("r", "rb", "w", "wb", "r+b"):
+            raise ValueError("Unsupported member mode {}".format(mode))
+
+        if name == "config.ini" and self._config != None:
+            self._config.flush() # Make sure the member has the latest settings
+
+        if "w" in mode:
+            member = tempfile.SpooledTemporaryFile(max_size = self.spoolSize)
+        else:
+            member = self.members[name]
+            member.seek(0)
 
-    return fidDict
+        if "b" in mode:
+            fid = member
+        else:
+            # SpooledTemporaryFile can only be wrapped in a TextIOWrapper from Python 3.11, so wrap a copy instead
+            fid = io.TextIOWrapper(io.BytesIO(b"" if "w" in mode else member.read()), encoding = "utf-8", newline = "")
+
+        try:
+            yield fid
+            fid.flush()
+            if "b" not in mode and "w" in mode:
+                member.write(fid.buffer.getvalue())
+        except BaseException:
+            if "w" in mode:
+                member.close()
+            raise
+        finally:
+            if "b" not in mode:
+                fid.close()
+
+        if "w" in mode:
+            # The old member is only dropped, not closed, in case it's still being read from
+            self.members[name] = member
+        if mode != "r" and mode != "rb":
+            self._modified.add(name)
+            if name == "config.ini" and self._config != None and not self._config._writing:
+                self._config.reload() # config.ini was written directly, so the parsed copy is out of date
+
+    def readText(self, name):
+        """
+        Returns the contents of a member as a string.
+        """
+        with self.open(name) as fid:
+            return fid.read()
+
+    def writeText(self, name, text):
+        """
+        Replaces the contents of a member with a string, adding the member if it doesn't exist.
+        """
+        with self.open(name, "w") as fid:
+            fid.write(text)
+
+    def save(self, filePath = None, compressLevel = 9):
+        """
+        Writes the archive to a new temporary file next to filePath and then renames it over filePath,
+        so the .ltm file is never left half-written. The members are compressed from the copies made when the archive
+        was opened, so the original file isn't read again, and it can be overwritten since it isn't kept open.
+        The whole archive is one gzip stream, so every member is still compressed again; use a low compressLevel
+        for files that are only going to be merged again.
+
+        Args:
+            filePath (str, optional): The path to write to. Defaults to None, in which case the archive's own path is used.
+            compressLevel (int, optional): The gzip compression level from 1 (fastest) to 9 (smallest). Defaults to 9, like libTAS.
+
+        Returns:
+            None.
+
+        File outputs:
+            filePath: The .ltm file. Note, this will be overwritten without prompting.
+        """
+        if filePath == None:
+            filePath = self.filePath
+        if self._config != None:
+            self._config.flush()
+
+        tempFD, tempPath = tempfile.mkstemp(suffix = ".tmp", dir = os.path.dirname(os.path.abspath(filePath)))
+        try:
+            with os.fdopen(tempFD, "wb") as tempFID:
+                with topen(filePath.removesuffix(".ltm"), "w:gz", fileobj = tempFID, compresslevel = compressLevel) as ltmFID:
+                    for name in self.names():
+                        ltmFID.addfile(self._tarInfo(name, self.members[name]), self.members[name])
+                tempFID.flush()
+                os.fsync(tempFID.fileno())
+
+            # mkstemp() makes the file readable by its owner only, so give it the permissions the file it replaces had,
+            # or the ones a new file would get
+            if os.path.exists(filePath):
+                fileMode = os.stat(filePath).st_mode & 0o7777
+            else:
+                umask = os.umask(0)
+                os.umask(umask)
+                fileMode = 0o666 & ~umask
+            os.chmod(tempPath, fileMode)
+            os.replace(tempPath, filePath)
+        except BaseException:
+            os.remove(tempPath)
+            raise
+
+    def _tarInfo(self, name, member):
+        """
+        Returns the tar header for a member, keeping the original header apart from the size and, for modified members, the time.
+        The member is left positioned at the start.
+        """
+        if name in self._memberInfo:
+            info = copy.copy(self._memberInfo[name])
+            info.name = name
+        else:
+            info = tarfile.TarInfo(name)
+            info.mode = 0o644
+        if name in self._modified or name not in self._memberInfo:
+            info.mtime = int(time.time())
+
+        info.size = member.seek(0, 2)
+        member.seek(0)
+        return info
+
+    def close(self):
+        """
+        Releases every member. The archive can't be used afterwards.
+
+        Returns:
+            None.
+        """
+        for member in self.members.values():
+            member.close()
+        self.members = {}
 
 def safeFileDelete(filepath):
     """
@@ -385,58 +1820,288 @@ def safeFileDelete(filepath):
         0
     """
 
-def getLibtasVersion(configPath):
+def _readConfig(configPath):
     """
-    Returns the libTAS version number from the configuration file.
+    Parses config.ini from a path or from an opened .ltm file, keeping the case of the keys.
 
     Args:
-        configFID (_io.TextIOWrapper): File ID of the configuration file
+        configPath (str or LtmArchive): Path to config file, or an opened .ltm file.
 
     Returns:
-        str: The libTAS version number (e.g. "1.3.4")
+        configparser.ConfigParser: The parsed configuration.
     """
     configData = configparser.ConfigParser()
     configData.optionxform = str
 
-    with open(configPath):
-        configData.read(configPath)
+    if isinstance(configPath, LtmArchive):
+        configData.read_string(configPath.readText("config.ini"))
+    else:
+        with open(configPath) as configFID:
+            configData.read_file(configFID)
 
-    # These are all stored by configparser as strings, so no need to convert types.
-    major = configData["General"]["libtas_major_version"]
-    minor = configData["General"]["libtas_minor_version"]
-    patch = configData["General"]["libtas_patch_version"]
+    return configData
 
-    return major + "." + minor + "." + patch
+def _writeConfig(configData, configPath):
+    """
+    Writes a parsed configuration back to config.ini at a path or in an opened .ltm file.
+
+    Args:
+        configData (configparser.ConfigParser): The configuration.
+        configPath (str or LtmArchive): Path to config file, or an opened .ltm file.
+
+    Returns:
+        None.
+    """
+    if isinstance(configPath, LtmArchive):
+        configText = io.StringIO()
+        configData.write(configText, space_around_delimiters=False)
+        configPath.writeText("config.ini", configText.getvalue())
+    else:
+        with open(configPath, "w") as configFID:
+            configData.write(configFID, space_around_delimiters=False)
+
+class LtmConfig:
+    """
+    The settings in config.ini, parsed once and written back once.
+    Reading a setting doesn't touch the file, and changed settings are only written when the config is flushed or closed,
+    or, for an LtmArchive, when the archive is saved. Use it with a with statement to write the changes back.
+    Get it from an LtmArchive with LtmArchive.config so every function working on the archive shares the same copy.
+
+    Attributes:
+        configPath (str or LtmArchive): Path to config file, or an opened .ltm file.
+        configData (configparser.ConfigParser): The parsed settings.
+        dirty (bool): Whether any setting has changed since the config was read or last written.
+    """
+    def __init__(self, configPath):
+        """
+        Parses config.ini.
+
+        Args:
+            configPath (str or LtmArchive): Path to config file, or an opened .ltm file.
+        """
+        self.configPath = configPath
+        self._writing = False
+        self.reload()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        if excType == None:
+            self.close()
+
+    def reload(self):
+        """
+        Parses config.ini again, dropping any changes that haven't been written.
+        """
+        self.configData = _readConfig(self.configPath)
+        self.dirty = False
+
+    def flush(self):
+        """
+        Writes the settings back to config.ini if any of them changed.
+        """
+        if self.dirty:
+            self.dirty = False
+            self._writing = True
+            try:
+                _writeConfig(self.configData, self.configPath)
+            finally:
+                self._writing = False
+
+    def close(self):
+        """
+        Writes the settings back to config.ini if any of them changed.
+        """
+        self.flush()
+
+    def _set(self, option, value):
+        """
+        Sets an option in the General section, storing bools the way libTAS does.
+        """
+        if isinstance(value, bool):
+            value = str(value).lower()
+        else:
+            value = str(value)
+        if self.configData.get("General", option, fallback = None) != value:
+            self.configData["General"][option] = value
+            self.dirty = True
+
+    def _micros(self, secOption, nsecOption):
+        """
+        Returns a time stored as whole seconds and nanoseconds in units of microseconds.
+        """
+        sec = self.configData.getint("General", secOption)
+        nsec = self.configData.getint("General", nsecOption)
+        return sec * 1000000 + nsec // 1000
+
+    @property
+    def version(self):
+        """
+        str: The libTAS version number (e.g. "1.3.4").
+        """
+        # These are all stored by configparser as strings, so no need to convert types.
+        general = self.configData["General"]
+        return general["libtas_major_version"] + "." + general["libtas_minor_version"] + "." + general["libtas_patch_version"]
+
+    @property
+    def framerateNum(self):
+        """
+        int: The FPS numerator.
+        """
+        return self.configData.getint("General", "framerate_num")
+
+    @framerateNum.setter
+    def framerateNum(self, num):
+        self._set("framerate_num", num)
+
+    @property
+    def framerateDen(self):
+        """
+        int: The FPS denominator.
+        """
+        return self.configData.getint("General", "framerate_den")
+
+    @framerateDen.setter
+    def framerateDen(self, den):
+        self._set("framerate_den", den)
+
+    @property
+    def variableFramerate(self):
+        """
+        bool: Whether variable fps is enabled. Older files might not have the setting, in which case it's off.
+        """
+        return self.configData.getboolean("General", "variable_framerate", fallback = False)
+
+    @variableFramerate.setter
+    def variableFramerate(self, variable_framerate):
+        if isinstance(variable_framerate, str): # Also accept "true" and "false"
+            variable_framerate = variable_framerate.lower() == "true"
+        self._set("variable_framerate", variable_framerate)
+
+    @property
+    def fps(self):
+        """
+        (int, int, bool): FPS numerator, denominator, variable FPS enabled.
+        """
+        return self.framerateNum, self.framerateDen, self.variableFramerate
+
+    @property
+    def startTime(self):
+        """
+        int: The start time in units of microseconds.
+        """
+        if self.configData.has_option("General", "initial_monotonic_time_sec"):
+            return self._micros("initial_monotonic_time_sec", "initial_monotonic_time_nsec")
+        else: # This is for pre-monotonic time versions
+            return self._micros("initial_time_sec", "initial_time_nsec")
+
+    @property
+    def length(self):
+        """
+        int: The length of the movie in units of microseconds.
+        """
+        return self._micros("length_sec", "length_nsec")
+
+    @property
+    def lengthNanos(self):
+        """
+        int: The length of the movie in units of nanoseconds, as libTAS stores it.
+        """
+        return self.configData.getint("General", "length_sec") * 1000000000 + self.configData.getint("General", "length_nsec")
+
+    @lengthNanos.setter
+    def lengthNanos(self, nanos):
+        self._set("length_sec", nanos // 1000000000)
+        self._set("length_nsec", nanos % 1000000000)
+
+    @property
+    def frameCount(self):
+        """
+        int: The number of frames in the movie.
+        """
+        return self.configData.getint("General", "frame_count")
+
+    @frameCount.setter
+    def frameCount(self, count):
+        self._set("frame_count", count)
+
+    @property
+    def endTime(self):
+        """
+        int: The end time in units of microseconds. This is different from the length and represents the clock time at the end.
+        """
+        return self.startTime + self.length
+
+    @property
+    def rerecordCount(self):
+        """
+        int: The rerecord count.
+        """
+        return self.configData.getint("General", "rerecord_count")
+
+    @rerecordCount.setter
+    def rerecordCount(self, count):
+        self._set("rerecord_count", count)
+
+    @property
+    def savestateFrameCount(self):
+        """
+        int: The savestate frame count.
+        """
+        return self.configData.getint("General", "savestate_frame_count")
+
+    @savestateFrameCount.setter
+    def savestateFrameCount(self, count):
+        self._set("savestate_frame_count", count)
+
+@contextmanager
+def _ltmConfig(configPath):
+    """
+    Yields the LtmConfig for a path, an opened .ltm file, or an LtmConfig, for use in a with statement.
+    A config parsed from a path is written back at the end of the with statement; the others are left for their owner to write.
+    """
+    if isinstance(configPath, LtmConfig):
+        yield configPath
+    elif isinstance(configPath, LtmArchive):
+        yield configPath.config
+    else:
+        with LtmConfig(configPath) as config:
+            yield config
+
+def getLibtasVersion(configPath):
+    """
+    Returns the libTAS version number from the configuration file.
+
+    Args:
+        configPath (str, LtmArchive or LtmConfig): Path to config file, an opened .ltm file, or a parsed config.
+
+    Returns:
+        str: The libTAS version number (e.g. "1.3.4")
+    """
+    with _ltmConfig(configPath) as config:
+        return config.version
 
 def getFPSConfig(configPath):
     """
     Returns the FPS numerator, denominator, and whether variable fps is enabled.
 
     Args:
-        configFID (_io.TextIOWrapper): File ID of the configuration file
+        configPath (str, LtmArchive or LtmConfig): Path to config file, an opened .ltm file, or a parsed config.
 
     Returns:
         int, int, bool: FPS numerator, denominator, variable FPS enabled
     """
-    configData = configparser.ConfigParser()
-    configData.optionxform = str
-    with open(configPath):
-        configData.read(configPath)
-
-    # FPS numerator and denominator should always be there
-    num = configData.getint("General","framerate_num")
-    den = configData.getint("General","framerate_den")
-
-    # Variable FPS might not be there
-    variable_framerate = configData.getboolean("General", "variable_framerate", fallback=False)
-    return num, den, variable_framerate
+    with _ltmConfig(configPath) as config:
+        return config.fps
 
 def setFPSConfig(configPath, num = None, den = None, variable_framerate = None):
     """
     Sets the FPS numerator, denominator, variable fps enabled
 
     Args:
-        configPath (str): The path to config.ini.
+        configPath (str, LtmArchive or LtmConfig): The path to config.ini, an opened .ltm file, or a parsed config.
+                                                   Only a path is written to straight away.
         num (int, optional): The FPS numerator.
         den (int, optional): The FPS denominator.
         variable_framerate (bool, optional): Whether variable fps is enabled or not.
@@ -444,18 +2109,13 @@ def setFPSConfig(configPath, num = None, den = None, variable_framerate = None):
     Returns:
         None.
     """
-    configData = configparser.ConfigParser()
-    configData.optionxform = str
-    #with open(configPath) as configFID:
-    configData.read(configPath)
-    if num != None:
-        configData["General"]["framerate_num"] = str(num)
-    if den != None:
-        configData["General"]["framerate_den"] = str(den)
-    if variable_framerate != None:
-        configData["General"]["variable_framerate"] = str(variable_framerate).lower()
-    with open(configPath, "w") as configFID:
-        configData.write(configFID, space_around_delimiters=False)
+    with _ltmConfig(configPath) as config:
+        if num != None:
+            config.framerateNum = num
+        if den != None:
+            config.framerateDen = den
+        if variable_framerate != None:
+            config.variableFramerate = variable_framerate
 
     return
 
@@ -464,26 +2124,14 @@ def getStartTime(configPath):
     Returns the start time in units of microseconds.
 
     Args:
-        configPath (str): Path to config file.
+        configPath (str, LtmArchive or LtmConfig): Path to config file, an opened .ltm file, or a parsed config.
 
     Returns:
         int: Start time in microseconds
 
     """
-    configData = configparser.ConfigParser()
-    configData.optionxform = str
-    configData.read(configPath)
-    try:
-        sec = configData.getint("General","initial_monotonic_time_sec")
-        nsec = configData.getint("General","initial_monotonic_time_nsec")
-    except KeyError: # This is for pre-monotonic time versions
-        sec = configData.getint("General","initial_time_sec")
-        nsec = configData.getint("General","initial_time_nsec")
-
-
-    micros = int(sec * 1000000 + nsec / 1000)
-
-    return micros
+    with _ltmConfig(configPath) as config:
+        return config.startTime
 
 
 def getEndTime(configPath):
@@ -491,28 +2139,14 @@ def getEndTime(configPath):
     Returns the end time in units of microseconds. This is different from the length and represents the clock time at the end.
 
     Args:
-        configPath (str): Path to config file.
+        configPath (str, LtmArchive or LtmConfig): Path to config file, an opened .ltm file, or a parsed config.
 
     Returns:
         int: End time in microseconds
 
     """
-    configData = configparser.ConfigParser()
-    configData.optionxform = str
-    configData.read(configPath)
-    try:
-        sec = configData.getint("General","initial_monotonic_time_sec")
-        nsec = configData.getint("General","initial_monotonic_time_nsec")
-    except KeyError: # This is for pre-monotonic time versions
-        sec = configData.getint("General","initial_time_sec")
-        nsec = configData.getint("General","initial_time_nsec")
-
-    lsec = configData.getint("General","length_sec")
-    lnsec = configData.getint("General","length_nsec")
-
-    micros = int(lsec * 1000000 + lnsec / 1000) + int(sec * 1000000 + nsec / 1000)
-
-    return micros
+    with _ltmConfig(configPath) as config:
+        return config.endTime
 
 
 
@@ -521,39 +2155,657 @@ def addRerecordCounts(configPath1, configPath2, ouputConfigPath):
     Adds the rerecord counts and the savestate frame counts together and puts them in the output file in preparation for merging
 
     Args:
-        configPath1 (str): Path to config 1.
-        configPath2 (str): Path to config 2.
-        ouputConfigPath (str): Path to config output.
+        configPath1 (str, LtmArchive or LtmConfig): Path to config 1, an opened .ltm file, or a parsed config.
+        configPath2 (str, LtmArchive or LtmConfig): Path to config 2, an opened .ltm file, or a parsed config.
+        ouputConfigPath (str, LtmArchive or LtmConfig): Path to config output, an opened .ltm file, or a parsed config.
 
     Returns:
         None.
 
     """
-    configData1 = configparser.ConfigParser()
-    configData1.optionxform = str
-    configData2 = configparser.ConfigParser()
-    configData2.optionxform = str
-    outconfigData = configparser.ConfigParser()
-    outconfigData.optionxform = str
-
-    configData1.read(configPath1)
-    configData2.read(configPath2)
-    outconfigData.read(ouputConfigPath)
-    rr1 = configData1["General"]["rerecord_count"]
-    ss1 = configData1["General"]["savestate_frame_count"]
-    rr2 = configData2["General"]["rerecord_count"]
-    ss2 = configData2["General"]["savestate_frame_count"]
-    outconfigData["General"]["rerecord_count"] = str(int(rr1) + int(rr2))
-    outconfigData["General"]["savestate_frame_count"] = str(int(ss1) + int(ss2))
-    with open(ouputConfigPath, "w") as configFID:
-        outconfigData.write(configFID, space_around_delimiters=False)
+    with _ltmConfig(configPath1) as config1, _ltmConfig(configPath2) as config2, _ltmConfig(ouputConfigPath) as outConfig:
+        rerecordCount = config1.rerecordCount + config2.rerecordCount
+        savestateFrameCount = config1.savestateFrameCount + config2.savestateFrameCount
+        outConfig.rerecordCount = rerecordCount
+        outConfig.savestateFrameCount = savestateFrameCount
 
     return
 
 
 
 
-def mergeLibtasFiles(firstFilepath, secondFilepath, outputFilepath):
+_framerateFieldText = re.compile(r"\|T(\d+):(\d+)\|")
+_framerateFieldBytes = re.compile(rb"\|T(\d+):(\d+)\|")
+
+def _framerateField(line, start = 0):
+    """
+    Finds the variable framerate field (e.g. "T60000000:1000123|") of a libTAS 1.4.4 input line.
+
+    Args:
+        line (str or bytes): The input line, or a whole inputs file.
+        start (int, optional): The position to start searching from. Defaults to 0.
+
+    Returns:
+        int, int, int: The position the field starts at (just after the "|" before the "T"), the numerator and the denominator,
+                       or None if there's no framerate field.
+    """
+    if isinstance(line, str):
+        match = _framerateFieldText.search(line, start)
+    else:
+        match = _framerateFieldBytes.search(line, start)
+
+    if match == None:
+        return None
+    return match.start() + 1, int(match.group(1)), int(match.group(2))
+
+class InputsTable:
+    """
+    The inputs file of an .ltm file loaded into columns with one entry per frame, so framerates can be looked up and edited
+    without going through the lines as strings. Frames are numbered from 1, like the lines of the inputs file.
+    Only the frames that were edited are rebuilt when the table is written, everything else is copied from the original file as-is.
+
+    Attributes:
+        data (bytes): The original inputs file.
+        baseNum (int): The FPS numerator of the movie, used for frames without their own framerate.
+        baseDen (int): The FPS denominator of the movie.
+        offsets (array): The byte offset of each frame's line in data, followed by the length of data.
+        textEnds (array): The byte offset where each frame's framerate field starts, or where its line ends if it has none.
+                          The controller text of a frame is data[offsets[i]:textEnds[i]].
+        nums (array): The FPS numerator of each frame.
+        dens (array): The FPS denominator of each frame.
+        custom (bytearray): 1 for the frames with their own framerate.
+        changed (bytearray): 1 for the frames edited since the table was read.
+    """
+    def __init__(self, data, baseNum, baseDen):
+        """
+        Parses an inputs file.
+
+        Args:
+            data (bytes): The contents of the inputs file.
+            baseNum (int): The FPS numerator of the movie.
+            baseDen (int): The FPS denominator of the movie.
+        """
+        self.data = bytes(data)
+        self.baseNum = baseNum
+        self.baseDen = baseDen
+        self.offsets = array("Q", [0])
+        self.textEnds = array("Q")
+
+        # Line offsets, leaving the line endings out of the text
+        offset = 0
+        for line in self.data.splitlines(True):
+            offset += len(line)
+            self.offsets.append(offset)
+            if line.endswith(b"\r\n"):
+                self.textEnds.append(offset - 2)
+            elif line.endswith(b"\n") or line.endswith(b"\r"):
+                self.textEnds.append(offset - 1)
+            else: # Last line without a newline
+                self.textEnds.append(offset)
+
+        frameCount = len(self.textEnds)
+        self.nums = array("Q", [baseNum]) * frameCount
+        self.dens = array("Q", [baseDen]) * frameCount
+        self.custom = bytearray(frameCount)
+        self.changed = bytearray(frameCount)
+
+        # Framerate fields are rare, so search the whole file for them instead of each line
+        field = _framerateField(self.data)
+        while field != None:
+            fieldStart, num, den = field
+            frameIndex = bisect_right(self.offsets, fieldStart) - 1
+            self.textEnds[frameIndex] = fieldStart
+            self.nums[frameIndex] = num
+            self.dens[frameIndex] = den
+            self.custom[frameIndex] = 1
+            field = _framerateField(self.data, self.offsets[frameIndex + 1])
+
+    @classmethod
+    def read(cls, inputFID, baseNum, baseDen):
+        """
+        Reads an inputs file from a binary file object.
+        """
+        return cls(inputFID.read(), baseNum, baseDen)
+
+    @classmethod
+    def fromLtm(cls, ltm):
+        """
+        Reads the inputs of an opened .ltm file, using the framerate from its config.
+
+        Args:
+            ltm (LtmArchive): The .ltm file.
+
+        Returns:
+            InputsTable: The inputs.
+        """
+        with ltm.open("inputs", "rb") as inputFID:
+            return cls.read(inputFID, ltm.config.framerateNum, ltm.config.framerateDen)
+
+    def __len__(self):
+        return len(self.textEnds)
+
+    def _index(self, frame):
+        """
+        Returns the array index of a frame number, raising an IndexError if there's no such frame.
+        """
+        if frame < 1 or frame > len(self):
+            raise IndexError("Frame {} is not in the inputs (1 to {})".format(frame, len(self)))
+        return frame - 1
+
+    def framerate(self, frame):
+        """
+        Returns the FPS numerator and denominator of a frame.
+        """
+        frameIndex = self._index(frame)
+        return self.nums[frameIndex], self.dens[frameIndex]
+
+    def isCustom(self, frame):
+        """
+        Returns whether a frame has its own framerate.
+        """
+        return self.custom[self._index(frame)] == 1
+
+    def customFrames(self):
+        """
+        Returns a list of the frames with their own framerate.
+        """
+        frames = []
+        frameIndex = self.custom.find(1)
+        while frameIndex != -1:
+            frames.append(frameIndex + 1)
+            frameIndex = self.custom.find(1, frameIndex + 1)
+        return frames
+
+    def controllerText(self, frame):
+        """
+        Returns the inputs of a frame without its framerate field or line ending, e.g. "|K7a|".
+        """
+        frameIndex = self._index(frame)
+        return self.data[self.offsets[frameIndex]:self.textEnds[frameIndex]].decode("utf-8")
+
+    def setFramerate(self, frame, num, den):
+        """
+        Gives a frame its own framerate.
+
+        Args:
+            frame (int): The frame number.
+            num (int): The FPS numerator.
+            den (int): The FPS denominator.
+
+        Returns:
+            None.
+        """
+        frameIndex = self._index(frame)
+        if num <= 0 or den <= 0:
+            raise ValueError("Frame {} framerate {}:{} is not positive".format(frame, num, den))
+        self.nums[frameIndex] = num
+        self.dens[frameIndex] = den
+        self.custom[frameIndex] = 1
+        self.changed[frameIndex] = 1
+
+    def clearFramerate(self, frame):
+        """
+        Removes the framerate of a frame so it uses the movie framerate.
+        """
+        frameIndex = self._index(frame)
+        self.nums[frameIndex] = self.baseNum
+        self.dens[frameIndex] = self.baseDen
+        self.custom[frameIndex] = 0
+        self.changed[frameIndex] = 1
+
+    def checkOverrides(self, overrides):
+        """
+        Checks framerate overrides for applyFramerates() without changing anything.
+
+        Args:
+            overrides (dict or list): {frame: (num, den)} or a list of (frame, (num, den)) pairs in increasing frame order.
+
+        Raises:
+            ValueError: A frame is out of range, repeated, out of order, or has a framerate that isn't positive.
+
+        Returns:
+            list: The overrides as (frame, (num, den)) pairs in frame order.
+        """
+        if isinstance(overrides, dict):
+            overrides = sorted(overrides.items())
+        else:
+            overrides = list(overrides)
+
+        previousFrame = 0
+        for frame, framerate in overrides:
+            if frame < 1 or frame > len(self):
+                raise ValueError("Frame {} is not in the inputs (1 to {})".format(frame, len(self)))
+            if frame == previousFrame:
+                raise ValueError("Frame {} is overridden more than once".format(frame))
+            if frame < previousFrame:
+                raise ValueError("Frame {} comes after frame {}, overrides must be in increasing frame order".format(frame, previousFrame))
+            if framerate != None and (framerate[0] <= 0 or framerate[1] <= 0):
+                raise ValueError("Frame {} framerate {}:{} is not positive".format(frame, *framerate))
+            previousFrame = frame
+        return overrides
+
+    def applyFramerates(self, overrides):
+        """
+        Sets the framerate of many frames at once. Every override is checked before any frame is changed,
+        so a bad override leaves the table as it was.
+
+        Args:
+            overrides (dict or list): {frame: (num, den)} or a list of (frame, (num, den)) pairs in increasing frame order.
+                                      A framerate of None removes the frame's own framerate.
+
+        Raises:
+            ValueError: A frame is out of range, repeated, out of order, or has a framerate that isn't positive.
+
+        Returns:
+            list: (frame, oldFramerate, newFramerate) for each frame that changed, in frame order,
+                  where a framerate is (num, den), or None for the movie framerate.
+        """
+        changes = []
+        overrides = self.checkOverrides(overrides)
+        for frame, framerate in overrides:
+            frameIndex = frame - 1
+            if self.custom[frameIndex]:
+                oldFramerate = (self.nums[frameIndex], self.dens[frameIndex])
+            else:
+                oldFramerate = None
+            if framerate != None:
+                framerate = tuple(framerate)
+            if framerate == oldFramerate:
+                continue
+
+            if framerate == None:
+                self.clearFramerate(frame)
+            else:
+                self.setFramerate(frame, *framerate)
+            changes.append((frame, oldFramerate, framerate))
+        return changes
+
+    def elapsedTime(self, frame = None):
+        """
+        Returns the time from the start of the movie to the start of a frame, in seconds.
+
+        Args:
+            frame (int, optional): The frame number. Defaults to None, in which case the length of the whole movie is returned.
+
+        Returns:
+            Fraction: The elapsed time in seconds.
+        """
+        frameCount = len(self) if frame == None else self._index(frame)
+        elapsed = Fraction(frameCount * self.baseDen, self.baseNum)
+
+        # Only the frames with their own framerate differ from the base
+        frameIndex = self.custom.find(1, 0, frameCount)
+        while frameIndex != -1:
+            elapsed += Fraction(self.dens[frameIndex], self.nums[frameIndex]) - Fraction(self.baseDen, self.baseNum)
+            frameIndex = self.custom.find(1, frameIndex + 1, frameCount)
+        return elapsed
+
+    def _line(self, frameIndex):
+        """
+        Returns the line of an edited frame as bytes, keeping its original line ending.
+        """
+        line = self.data[self.offsets[frameIndex]:self.textEnds[frameIndex]]
+        if self.custom[frameIndex]:
+            line += b"T%d:%d|" % (self.nums[frameIndex], self.dens[frameIndex])
+        lineEnd = self.data[self.offsets[frameIndex + 1] - 2:self.offsets[frameIndex + 1]]
+        if lineEnd == b"\r\n":
+            line += lineEnd
+        elif lineEnd.endswith(b"\n") or lineEnd.endswith(b"\r"):
+            line += lineEnd[-1:]
+        return line
+
+    def write(self, outputFID):
+        """
+        Writes the inputs in libTAS 1.4.4 format to a binary file object, copying the unedited frames as-is.
+
+        Args:
+            outputFID (file): A binary file object. The inputs will be written wherever the current index is.
+
+        Returns:
+            None.
+        """
+        view = memoryview(self.data)
+        copyStart = 0
+        frameIndex = self.changed.find(1)
+        while frameIndex != -1:
+            outputFID.write(view[copyStart:self.offsets[frameIndex]])
+            outputFID.write(self._line(frameIndex))
+            copyStart = self.offsets[frameIndex + 1]
+            frameIndex = self.changed.find(1, frameIndex + 1)
+        outputFID.write(view[copyStart:])
+
+    def tobytes(self):
+        """
+        Returns the inputs in libTAS 1.4.4 format.
+        """
+        outputFID = io.BytesIO()
+        self.write(outputFID)
+        return outputFID.getvalue()
+
+    def toLtm(self, ltm):
+        """
+        Replaces the inputs of an opened .ltm file.
+        """
+        with ltm.open("inputs", "wb") as outputFID:
+            self.write(outputFID)
+
+class TimeIndex:
+    """
+    Maps frames of an inputs file to the clock time in microseconds and back, the same way libTAS's Elapsed Time counts,
+    using exact fractions of a second. Each frame lasts den/num seconds from its own framerate or the movie framerate.
+    The time a frame starts at is kept as a running total in a Fenwick tree of how much each frame differs from the
+    movie framerate, so changing a frame's framerate only updates a few totals instead of every frame after it.
+
+    Attributes:
+        inputs (InputsTable): The inputs the times are worked out from.
+        startMicros (int): The clock time at the start of the movie in microseconds.
+    """
+    def __init__(self, inputs, startMicros = 0):
+        """
+        Builds the index.
+
+        Args:
+            inputs (InputsTable): The inputs.
+            startMicros (int, optional): The clock time at the start of the movie in microseconds. Defaults to 0.
+        """
+        self.inputs = inputs
+        self.startMicros = startMicros
+        self._basePeriod = Fraction(inputs.baseDen, inputs.baseNum)
+        self._frameCount = len(inputs)
+        self._deltas = {} # {frame: how much longer than the movie framerate the frame lasts, in seconds}
+        self._tree = [0] * (self._frameCount + 1)
+
+        for frame in inputs.customFrames():
+            delta = self._delta(frame)
+            if delta != 0:
+                self._deltas[frame] = delta
+                self._tree[frame] = delta
+
+        # Turn the deltas into Fenwick tree totals in place
+        for index in range(1, self._frameCount + 1):
+            parent = index + (index & -index)
+            if parent <= self._frameCount and self._tree[index] != 0:
+                self._tree[parent] += self._tree[index]
+
+    @classmethod
+    def fromLtm(cls, ltm):
+        """
+        Builds the index of an opened .ltm file, using the start time from its config.
+
+        Args:
+            ltm (LtmArchive): The .ltm file.
+
+        Returns:
+            TimeIndex: The index.
+        """
+        return cls(InputsTable.fromLtm(ltm), ltm.config.startTime)
+
+    def _delta(self, frame):
+        """
+        Returns how much longer than the movie framerate a frame lasts, in seconds.
+        """
+        num, den = self.inputs.framerate(frame)
+        return Fraction(den, num) - self._basePeriod
+
+    def _elapsed(self, frameCount):
+        """
+        Returns the total length of the first frameCount frames in seconds.
+        """
+        elapsed = frameCount * self._basePeriod
+        while frameCount > 0:
+            elapsed += self._tree[frameCount]
+            frameCount -= frameCount & -frameCount
+        return elapsed
+
+    def microsAtFrame(self, frame):
+        """
+        Returns the clock time at the start of a frame.
+
+        Args:
+            frame (int): The frame number, from 1 to one past the last frame (the end of the movie).
+
+        Returns:
+            int: The clock time in microseconds, rounded down.
+        """
+        if frame < 1 or frame > self._frameCount + 1:
+            raise IndexError("Frame {} is not in the inputs (1 to {})".format(frame, self._frameCount + 1))
+        elapsed = self._elapsed(frame - 1)
+        return self.startMicros + elapsed.numerator * 1000000 // elapsed.denominator
+
+    def frameAtMicros(self, micros):
+        """
+        Returns the frame that is running at a clock time, i.e. the last frame with microsAtFrame(frame) <= micros.
+
+        Args:
+            micros (int): The clock time in microseconds.
+
+        Raises:
+            ValueError: micros is before the start or at or after the end of the movie.
+
+        Returns:
+            int: The frame number.
+        """
+        if micros < self.startMicros:
+            raise ValueError("{} is before the start of the movie at {}".format(micros, self.startMicros))
+
+        # Find the most frames that end before micros + 1, walking down the Fenwick tree.
+        # Every frame has a positive length, so the totals only ever increase.
+        target = Fraction(micros + 1 - self.startMicros, 1000000)
+        frameCount = 0
+        elapsed = 0
+        step = 1 << self._frameCount.bit_length()
+        while step > 0:
+            nextCount = frameCount + step
+            if nextCount <= self._frameCount:
+                nextElapsed = elapsed + step * self._basePeriod + self._tree[nextCount]
+                if nextElapsed < target:
+                    frameCount = nextCount
+                    elapsed = nextElapsed
+            step >>= 1
+
+        if frameCount == self._frameCount:
+            raise ValueError("{} is at or after the end of the movie at {}".format(micros, self.microsAtFrame(self._frameCount + 1)))
+        return frameCount + 1
+
+    def update(self, frame):
+        """
+        Updates the index after the framerate of a frame was changed in the inputs.
+
+        Args:
+            frame (int): The frame number.
+
+        Returns:
+            None.
+        """
+        delta = self._delta(frame)
+        change = delta - self._deltas.get(frame, 0)
+        if delta != 0:
+            self._deltas[frame] = delta
+        else:
+            self._deltas.pop(frame, None)
+
+        if change != 0:
+            index = frame
+            while index <= self._frameCount:
+                self._tree[index] += change
+                index += index & -index
+
+    def setFramerate(self, frame, num, den):
+        """
+        Gives a frame its own framerate in the inputs and updates the index, see InputsTable.setFramerate().
+        """
+        self.inputs.setFramerate(frame, num, den)
+        self.update(frame)
+
+    def clearFramerate(self, frame):
+        """
+        Removes the framerate of a frame in the inputs and updates the index, see InputsTable.clearFramerate().
+        """
+        self.inputs.clearFramerate(frame)
+        self.update(frame)
+
+    def applyFramerates(self, overrides):
+        """
+        Sets the framerate of many frames in the inputs and updates the index, see InputsTable.applyFramerates().
+        """
+        changes = self.inputs.applyFramerates(overrides)
+        for frame, oldFramerate, newFramerate in changes:
+            self.update(frame)
+        return changes
+
+def _simplestFraction(low, high):
+    """
+    Returns the fraction with the smallest numerator and denominator between low and high, inclusive, where 0 <= low <= high.
+    """
+    whole = low.numerator // low.denominator
+    if whole == low or whole + 1 <= high:
+        return Fraction(whole if whole == low else whole + 1)
+    # Both ends are between whole and whole + 1, so continue with the reciprocals of the fractional parts
+    return whole + 1 / _simplestFraction(1 / (high - whole), 1 / (low - whole))
+
+def libtasFrameNanos(num, den, fractional = 0):
+    """
+    Returns how many nanoseconds libTAS 1.4.4 advances its clock by for one frame at num:den.
+    libTAS adds the whole nanoseconds of den/num seconds each frame and keeps the remainder in units of 1/num nanoseconds,
+    adding an extra nanosecond whenever the remainder reaches num. Only one extra nanosecond is added per frame.
+
+    Args:
+        num (int): The FPS numerator of the frame.
+        den (int): The FPS denominator of the frame.
+        fractional (int, optional): The remainder left over from the previous frames. Defaults to 0.
+
+    Returns:
+        int, int: The nanoseconds the frame lasts, and the remainder left over for the next frame.
+    """
+    nanos, remainder = divmod(1000000000 * den, num)
+    fractional += remainder
+    if fractional >= num:
+        nanos += 1
+        fractional -= num
+    return nanos, fractional
+
+def _libtasRunNanos(num, den, count, fractional):
+    """
+    Returns libtasFrameNanos() summed over count frames in a row at num:den, without going through them one at a time.
+    """
+    nanos = 0
+    whole, remainder = divmod(1000000000 * den, num)
+
+    # A remainder left over from a frame with a higher numerator only gets one extra nanosecond per frame
+    while count > 0 and fractional >= num:
+        frameNanos, fractional = libtasFrameNanos(num, den, fractional)
+        nanos += frameNanos
+        count -= 1
+    if count == 0:
+        return nanos, fractional
+
+    # From here the remainder stays below num, so each frame gets at most one extra nanosecond
+    fractional += count * remainder
+    nanos += count * whole + fractional // num
+    return nanos, fractional % num
+
+def libtasNanosAtFrame(inputs, frame, overrides = None, fractional = 0):
+    """
+    Returns the time at the start of a frame the way libTAS 1.4.4 counts it in nanoseconds, see libtasFrameNanos().
+    Frames at the movie framerate are counted in runs, so this only goes through the frames with their own framerate.
+
+    Args:
+        inputs (InputsTable): The inputs.
+        frame (int): The frame number, from 1 to one past the last frame (the end of the movie).
+        overrides (dict, optional): {frame: (num, den)} framerates to use instead of the ones in the inputs. Defaults to None.
+        fractional (int, optional): libTAS's remainder at the start of the inputs, for inputs that carry on from others.
+                                    Defaults to 0.
+
+    Returns:
+        int, int: The nanoseconds since the start of the movie, and libTAS's remainder at that point.
+    """
+    if frame < 1 or frame > len(inputs) + 1:
+        raise IndexError("Frame {} is not in the inputs (1 to {})".format(frame, len(inputs) + 1))
+    if overrides == None:
+        overrides = {}
+
+    nanos = 0
+    runStart = 1
+    for customFrame in sorted(set(inputs.customFrames()).union(overrides)):
+        if customFrame >= frame:
+            break
+        runNanos, fractional = _libtasRunNanos(inputs.baseNum, inputs.baseDen, customFrame - runStart, fractional)
+        if customFrame in overrides:
+            frameNanos, fractional = libtasFrameNanos(*overrides[customFrame], fractional)
+        else:
+            frameNanos, fractional = libtasFrameNanos(*inputs.framerate(customFrame), fractional)
+        nanos += runNanos + frameNanos
+        runStart = customFrame + 1
+    runNanos, fractional = _libtasRunNanos(inputs.baseNum, inputs.baseDen, frame - runStart, fractional)
+    return nanos + runNanos, fractional
+
+def planFramerates(inputs, frame, delayMicros, minFps = None, maxFps = None, maxFrames = 60, overrides = None):
+    """
+    Finds framerates that make the end of a frame happen delayMicros later in libTAS's clock, down to the microsecond.
+    The frame gets the framerate with the smallest numerator and denominator that lands on the right microsecond, checked
+    against libTAS's nanosecond counting. If the frame can't take the whole delay within minFps and maxFps, or libTAS's
+    32 bit framerate limit, the frames before it are set to the slowest (or fastest) fps allowed to take the rest.
+
+    Args:
+        inputs (InputsTable): The inputs.
+        frame (int): The frame whose end is to be moved.
+        delayMicros (int): The number of microseconds to move it by. Can be negative.
+        minFps (int or Fraction, optional): The lowest fps a frame can be set to. Defaults to None, for no limit.
+        maxFps (int or Fraction, optional): The highest fps a frame can be set to. Defaults to None, for no limit.
+        maxFrames (int, optional): The most frames the delay can be spread over. Defaults to 60.
+        overrides (dict, optional): {frame: (num, den)} framerates already planned for earlier frames, which are kept
+                                    as they are. Defaults to None.
+
+    Raises:
+        ValueError: The delay can't be reached within the limits.
+
+    Returns:
+        list: (frame, (num, den)) overrides for InputsTable.applyFramerates(), in frame order.
+    """
+    if overrides == None:
+        overrides = {}
+    maxValue = 0xFFFFFFFF # libTAS keeps the framerate as unsigned 32 bit numbers
+    minPeriod = Fraction(1, maxValue) if maxFps == None else 1 / Fraction(maxFps)
+    maxPeriod = Fraction(maxValue) if minFps == None else 1 / Fraction(minFps)
+    if delayMicros >= 0:
+        fillPeriod = maxPeriod
+    else:
+        fillPeriod = minPeriod
+    fillFramerate = (fillPeriod.denominator, fillPeriod.numerator)
+
+    targetMicros = libtasNanosAtFrame(inputs, frame + 1, overrides)[0] // 1000 + delayMicros
+    for frameCount in range(1, min(maxFrames, frame) + 1):
+        firstFrame = frame - frameCount + 1
+        if firstFrame in overrides: # Don't undo an earlier plan
+            break
+        nanos, fractional = libtasNanosAtFrame(inputs, firstFrame, overrides)
+        plan = {}
+        for fillFrame in range(firstFrame, frame):
+            plan[fillFrame] = fillFramerate
+            frameNanos, fractional = libtasFrameNanos(*fillFramerate, fractional)
+            nanos += frameNanos
+
+        # The last frame lasts its whole nanoseconds plus at most one, and has to end within the target microsecond
+        lowNanos = targetMicros * 1000 - nanos
+        highNanos = lowNanos + 998
+        low = max(Fraction(lowNanos, 1000000000), minPeriod)
+        high = min(Fraction(2 * highNanos + 1, 2000000000), maxPeriod)
+        if high < low or high <= 0:
+            continue
+        period = _simplestFraction(max(low, Fraction(1, maxValue)), high)
+        if period.numerator > maxValue or period.denominator > maxValue:
+            continue
+        plan[frame] = (period.denominator, period.numerator)
+
+        # Check it against libTAS's own counting before using it
+        plannedOverrides = dict(overrides)
+        plannedOverrides.update(plan)
+        if libtasNanosAtFrame(inputs, frame + 1, plannedOverrides)[0] // 1000 == targetMicros:
+            return sorted(plan.items())
+
+    raise ValueError("Frame {} can't be moved by {} micros within the fps limits".format(frame, delayMicros))
+
+def mergeLibtasFiles(firstFilepath, secondFilepath, outputFilepath, compressLevel = 9):
     """
     Takes two filepaths to .ltm files and merges the two into an output .ltm file.
     This function takes into account the version of the ltm file and uses variable fps to get the correct output.
@@ -562,7 +2814,8 @@ def mergeLibtasFiles(firstFilepath, secondFilepath, outputFilepath):
     Args:
         firstFilepath (str): Path to the first .ltm file.
         secondFilepath (str): Path to the second .ltm file.
-        outputFilepath (str): Path to the output .ltm file. Will be deleted if it exists.
+        outputFilepath (str): Path to the output .ltm file. Will be overwritten if it exists.
+        compressLevel (int, optional): The gzip compression level of the output file. Defaults to 9. Use 1 if the output is going to be merged again.
 
     Returns:
         None.
@@ -571,8 +2824,8 @@ def mergeLibtasFiles(firstFilepath, secondFilepath, outputFilepath):
         outputFilepath: The merged .ltm file. Note, this will be overwritten without prompting.
     """
     # First open the two file paths to merge
-    fidDict = openltm(firstFilepath)
-    fidDict.update(openltm(secondFilepath))
+    firstLtm = LtmArchive(firstFilepath)
+    secondLtm = LtmArchive(secondFilepath)
 
     # Retrieve version numbers
     versions = ["0.0.0", "0.0.0", "0,0,0"] # First file, second file, output file
@@ -580,67 +2833,40 @@ def mergeLibtasFiles(firstFilepath, secondFilepath, outputFilepath):
     fps_dens = [1, 1, 1]
     varfpses = ["true", "true", "true"]
 
-    versions[0] = getLibtasVersion(fidDict[firstFilepath][2])
-    versions[1] = getLibtasVersion(fidDict[secondFilepath][2])
-    fps_nums[0], fps_dens[0], varfpses[0] = getFPSConfig(fidDict[firstFilepath][2])
-    fps_nums[1], fps_dens[1], varfpses[1] = getFPSConfig(fidDict[secondFilepath][2])
+    versions[0] = getLibtasVersion(firstLtm)
+    versions[1] = getLibtasVersion(secondLtm)
+    fps_nums[0], fps_dens[0], varfpses[0] = getFPSConfig(firstLtm)
+    fps_nums[1], fps_dens[1], varfpses[1] = getFPSConfig(secondLtm)
 
     outputStatus = -1
     # outputStatus indicates whether the output file is new, copied from file 1, or copied from file 2
-    # 0: Output file was already created and should be overwritten
     # 1: Output file was copied from file 1
     # 2: Output file was copied from file 2
 
-    # Check if output file exists, otherwise make a copy of the file with the newer version number
-    if os.path.isfile(outputFilepath):
-        # If it does exist, delete it. We will be making it ourselves.
-        os.remove(outputFilepath)
-
-        # fidDict.update(openltm(outputFilepath))
-        # versions[2] = getLibtasVersion(fidDict[outputFilepath][2])
-        # outputStatus = 0
-        # if float(versions[2][2:]) < float(versions[1][2:]) and float(versions[2][2:]) < float(versions[0][2:]):
-        #     # If the version of the output is lower than the version of both inputs, fall back on copying the newest input.
-        #     # Find the file with the greatest version number,
-        #     # simplifying the compare by assuming they all start with "1."
-        #     # and have single digit minor/patch versions
-        #     if float(versions[0][2:]) < float(versions[1][2:]): # Second file is newer version
-        #         shutil.copyfile(secondFilepath, outputFilepath)
-        #         fidDict.update(openltm(outputFilepath))
-        #         versions[2] = versions[1]
-        #         outputStatus = 2
-
-        #     else: # First file is newer or the same version
-        #         shutil.copyfile(firstFilepath, outputFilepath)
-        #         fidDict.update(openltm(outputFilepath))
-        #         versions[2] = versions[0]
-        #         outputStatus = 1
-
-
+    # Make an in-memory copy of the file with the newer version number. It's only written to outputFilepath at the end.
     # Find the file with the greatest version number,
     # simplifying the compare by assuming they all start with "1."
     # and have single digit minor/patch versions
     if float(versions[0][2:]) < float(versions[1][2:]): # Second file is newer version
-        shutil.copyfile(secondFilepath, outputFilepath)
-        fidDict.update(openltm(outputFilepath))
+        outputLtm = LtmArchive(secondFilepath)
         versions[2] = versions[1]
         outputStatus = 2
 
     else: # First file is newer or the same version
-        shutil.copyfile(firstFilepath, outputFilepath)
-        fidDict.update(openltm(outputFilepath))
+        outputLtm = LtmArchive(firstFilepath)
         versions[2] = versions[0]
         outputStatus = 1
 
     # Add rerecord counts in preparation
-    addRerecordCounts(fidDict[firstFilepath][2], fidDict[secondFilepath][2], fidDict[outputFilepath][2])
+    addRerecordCounts(firstLtm, secondLtm, outputLtm)
 
     # Now all the files are opened and the version numbers are known
 
     # Compare the default framerates and whether variable fps is on
     # For now assume an integer fps with den = 1. Otherwise the math gets complicated.
     inputFIDs = [0, 0, 0]
-    with open(fidDict[firstFilepath][4]) as inputFIDs[0], open(fidDict[secondFilepath][4]) as inputFIDs[1], open(fidDict[outputFilepath][4], "w") as inputFIDs[2]:
+    # The inputs are copied as bytes in blocks, and only the lines that need their fps changed are rebuilt
+    with firstLtm.open("inputs", "rb") as inputFIDs[0], secondLtm.open("inputs", "rb") as inputFIDs[1], outputLtm.open("inputs", "wb") as inputFIDs[2]:
         if fps_dens[0] == 1 and fps_dens[1] == 1:
             fps_nums[2] = fps_nums[0] # Make the new fps equal to the first file fps
 
@@ -649,15 +2875,15 @@ def mergeLibtasFiles(firstFilepath, secondFilepath, outputFilepath):
             else:
                 varfpses[2] = "true"
 
-            setFPSConfig(fidDict[outputFilepath][2], fps_nums[2], fps_dens[2], varfpses[2]) # Set the fps config options
+            setFPSConfig(outputLtm, fps_nums[2], fps_dens[2], varfpses[2]) # Set the fps config options
 
             if versions[0] == versions[1]:
                 # if the versions are all equal:
-                inputFIDs[2].write(inputFIDs[0].read()) # The first file will always be at the base fps.
+                shutil.copyfileobj(inputFIDs[0], inputFIDs[2], 0x100000) # The first file will always be at the base fps.
                 if fps_nums[0] == fps_nums[1]:
                     # if the fpses are also equal
                     # inputFIDs[2].write(inputFIDs[0].read())
-                    inputFIDs[2].write(inputFIDs[1].read())
+                    shutil.copyfileobj(inputFIDs[1], inputFIDs[2], 0x100000)
                 else: # if the second file is at a different fps
                     # if the fpses are not equal, use variable fps
                     # convertFPS(inputFIDs[0], fps_nums[0], fps_dens[0], inputFIDs[2], fps_nums[2], fps_dens[2])
@@ -713,124 +2939,373 @@ def mergeLibtasFiles(firstFilepath, secondFilepath, outputFilepath):
 
 
 
-    # finally, close all of the files
-    closeltm(fidDict, merge = {firstFilepath:False, secondFilepath:False, outputFilepath:True})
+    # finally, write the output file and close all of the files
+    outputLtm.save(outputFilepath, compressLevel)
+    firstLtm.close()
+    secondLtm.close()
+    outputLtm.close()
 
 
 def convertFPS(inputFID, inputNum, inputDen, outputFID, outputNum, outputDen, varFPS = False):
     """
     This function takes input and output information and writes the input into the output, changing fps if needed.
+    Frames at the input fps get it as variable fps unless it's the same as the output fps, and frames with variable fps
+    that's the same as the output fps have it removed. Everything else is copied as-is.
+    The input is processed in large blocks of bytes and only the lines that change are rebuilt.
 
     Args:
-        inputFID (file): FID for input file.
+        inputFID (file): Binary FID for input file.
         inputNum (int): Input numerator.
         inputDen (int): Input denominator.
-        outputFID (file): FID for output file. Inputs will be written wherever the current index is.
+        outputFID (file): Binary FID for output file. Inputs will be written wherever the current index is.
         outputNum (int): Output numerator.
         outputDen (int): Output denominator.
-        varFPS (bool, optional): whether variable fps has been encountered yet.
+        varFPS (bool, optional): Unused, kept so older calls still work.
 
     Returns:
-        bool: varFPS, whether variable fps was used yet.
+        int: The number of frames that were rewritten.
 
     """
+    outputPeriod = Fraction(outputDen, outputNum)
+    sameFPS = Fraction(inputDen, inputNum) == outputPeriod
+    inputField = b"T%d:%d|" % (inputNum, inputDen)
+    rewrittenCount = 0
+
+    def convertSpan(span):
+        # Lines without variable fps, which all need the input fps if it's not the output fps
+        nonlocal rewrittenCount
+        if sameFPS or len(span) == 0:
+            return span
+        rewrittenCount += span.count(b"\n")
+        span = span.replace(b"\n", inputField + b"\n").replace(b"\r" + inputField, inputField + b"\r") # Keep CRLF line endings together
+        return span
+
+    leftover = b""
+    while True:
+        block = inputFID.read(0x100000)
+        if len(block) == 0:
+            break
+        block = leftover + block
+        blockEnd = block.rfind(b"\n") + 1 # Only whole lines, the rest goes with the next block
+        leftover = block[blockEnd:]
+        block = block[:blockEnd]
+
+        copyStart = 0
+        field = _framerateField(block)
+        while field != None:
+            fieldStart, thisNum, thisDen = field
+            lineStart = block.rfind(b"\n", 0, fieldStart) + 1
+            fieldEnd = block.index(b"|", fieldStart) + 1
+            lineEnd = block.index(b"\n", fieldEnd) + 1
+            outputFID.write(convertSpan(block[copyStart:lineStart]))
+            if Fraction(thisDen, thisNum) == outputPeriod: # Remove variable fps that's the same as the new fps
+                outputFID.write(block[lineStart:fieldStart] + block[fieldEnd:lineEnd])
+                rewrittenCount += 1
+            else:
+                outputFID.write(block[lineStart:lineEnd])
+            copyStart = lineEnd
+            field = _framerateField(block, lineEnd)
+        outputFID.write(convertSpan(block[copyStart:]))
+
+    # A last line without a newline
+    if len(leftover) > 0:
+        field = _framerateField(leftover)
+        if field == None:
+            if not sameFPS:
+                leftover = leftover.rstrip(b"\r") + inputField + leftover[len(leftover.rstrip(b"\r")):]
+                rewrittenCount += 1
+        elif Fraction(field[2], field[1]) == outputPeriod:
+            leftover = leftover[:field[0]] + leftover[leftover.index(b"|", field[0]) + 1:]
+            rewrittenCount += 1
+        outputFID.write(leftover)
+
+    return rewrittenCount
+
+
+def readLastFrames(inputFID, count = 1, blockSize = 0x10000):
+    """
+    Returns the last frames of an inputs file, reading backwards from the end in blocks so the rest of the file isn't read.
 
-    for line in inputFID:
-        # # if the original fps matches the new fps, just copy everything as-is
-        # if inputNum == outputNum:
-        #     outputFID.write(line)
-        # if it used variable fps, check if it's the first
-        if "|T" in line:
-        # if it is the first, replace with original fps
-            lineSplitByFps = line.split("|T")
-            thisNum = int(lineSplitByFps[1].split(":")[0])
-            if thisNum == outputNum: # if the fps of this frame matches the new fps (can't match old fps or else it would not be variable fps)
-                line = lineSplitByFps[0] + "|\n" # Remove variable fps
-                # Otherwise write the line as-is
+    Args:
+        inputFID (file): Binary FID for the inputs file. It must be seekable.
+        count (int, optional): The number of frames to return. Defaults to 1.
+        blockSize (int, optional): The number of bytes to read at a time. Defaults to 0x10000.
 
-            outputFID.write(line)
+    Returns:
+        list: (offset, line) for each of the last count frames (fewer if the file is shorter) in file order,
+              where offset is the byte offset of the line and line is the bytes of the line including its line ending.
+    """
+    fileEnd = inputFID.seek(0, 2)
+    position = fileEnd
+    data = b""
+
+    # Read blocks until there are enough newlines before the last line's own newline
+    while position > 0:
+        readSize = min(blockSize, position)
+        position -= readSize
+        inputFID.seek(position)
+        data = inputFID.read(readSize) + data
+        if data.count(b"\n", 0, len(data) - 1) >= count:
+            break
+
+    frames = []
+    lineEnd = len(data)
+    searchEnd = len(data) - 1 # The last line's own newline doesn't start a new line
+    while lineEnd > 0 and len(frames) < count:
+        lineStart = data.rfind(b"\n", 0, searchEnd) + 1
+        frames.append((position + lineStart, data[lineStart:lineEnd]))
+        lineEnd = lineStart
+        searchEnd = lineStart - 1
+    frames.reverse()
+    return frames
+
+def rewriteLastFrame(inputFID, line, blockSize = 0x10000):
+    """
+    Replaces the last frame of an inputs file in place, keeping its line ending, and cuts off anything the old frame left behind.
+    A last frame without a newline gets one.
 
-        else: # No variable fps but need to convert to variable fps
-            outputFID.write(line.strip("\n") + "T" + str(inputNum) + ":" + str(inputDen) + "|\n")
-    return varFPS
+    Args:
+        inputFID (file): Binary FID for the inputs file, opened for reading and writing. It must be seekable.
+        line (str or bytes): The new frame, without a line ending.
+        blockSize (int, optional): The number of bytes to read at a time, see readLastFrames(). Defaults to 0x10000.
 
+    Returns:
+        int: The byte offset of the last frame.
+    """
+    if isinstance(line, str):
+        line = line.encode("utf-8")
+
+    lastFrames = readLastFrames(inputFID, 1, blockSize)
+    if len(lastFrames) == 0: # Empty file, so the new frame is the only one
+        offset, lineEnd = 0, b"\n"
+    else:
+        offset, oldLine = lastFrames[0]
+        lineEnd = oldLine[len(oldLine.rstrip(b"\r\n")):]
+        if lineEnd == b"":
+            lineEnd = b"\n"
+
+    inputFID.seek(offset)
+    inputFID.write(line.rstrip(b"\r\n") + lineEnd)
+    inputFID.truncate()
+    return offset
 
-def appendResetAndSeed(firstFilepath, secondFilepath):
+def appendResetAndSeed(firstFilepath, secondFilepath, compressLevel = 1, exactTiming = False):
     """
     Finds the initial seed using the start time from secondFilepath and appends a reset and extra time to the end of firstFilepath.
     This function is meant to be used in preparation for merging the two files.
     Keep in mind that mid-run seed resets will still need to be corrected.
-    Assumes version 1.4.4. Assumes the last frame is the standard fps.
+    Assumes version 1.4.4.
 
     Args:
         firstFilepath (str): Path to the first .ltm file.
         secondFilepath (str): Path to the second .ltm file.
+        compressLevel (int, optional): The gzip compression level the first file is written back with.
+                                       Defaults to 1 (fastest), since the file is recompressed when it's merged anyway.
+        exactTiming (bool, optional): If True, the framerate of the final frame is planned with planFramerates() so the
+                                      first file ends on the right microsecond in libTAS's own nanosecond timing.
+                                      This reads all of the inputs. Defaults to False, which lengthens the final frame
+                                      by exactly the micros and only reads the end of the inputs.
 
     Returns:
         int: the new end time of the first file and the start time of the second file.
 
     """
 
-    # First open up both files
-    fidDict = openltm(firstFilepath)
-    fidDict.update(openltm(secondFilepath))
+    # Read the second file start time, which is all that's needed from it
+    with LtmArchive(secondFilepath) as secondLtm:
+        startTime = getStartTime(secondLtm)
 
-    # Read the times: first file end time and second file start time
-    startTime = getStartTime(fidDict[secondFilepath][2])
-    endTime = getEndTime(fidDict[firstFilepath][2])
+    # Then open up the first file to edit it
+    with LtmArchive(firstFilepath) as firstLtm:
+        # Read the first file end time
+        endTime = getEndTime(firstLtm)
 
-    # Read the first file fps
-    num, den, varfps = getFPSConfig(fidDict[firstFilepath][2])
+        # Read the first file fps
+        num, den, varfps = getFPSConfig(firstLtm)
 
-    # Set variable fps to true if it is not
-    if varfps == False:
-        setFPSConfig(fidDict[firstFilepath][2], variable_framerate = True)
+        # Set variable fps to true if it is not
+        if varfps == False:
+            setFPSConfig(firstLtm, variable_framerate = True)
 
-    # Get the required seed
-    state = randomizeMicrosState(startTime)
+        # Get the required seed
+        state = randomizeMicrosState(startTime)
 
-    # Search for the seed starting from endTime
-    newEndTime = matchState(state, endTime)
+        # Search for the seed starting from endTime
+        newEndTime = matchState(state, endTime)
 
-    # newEndTime could be -1 if no seed was found within 1 second (probably means it's an error)
-    if newEndTime < endTime:
+        # newEndTime could be -1 if no seed was found within 1 second (probably means it's an error)
+        if newEndTime < endTime:
 
-        return
+            return
 
-    # Calculate updated num and den for the final frame
-    # Does this work for den other than 1? (probably)
-    newNum = num * 1000000
-    newDen = den * 1000000 + (num * (newEndTime - endTime))
+        if exactTiming: # Plan the final frame against libTAS's timing, which needs the frames before it
+            inputs = InputsTable.fromLtm(firstLtm)
+            inputs.applyFramerates(planFramerates(inputs, len(inputs), newEndTime - endTime))
+            inputs.toLtm(firstLtm)
+            firstLtm.save(compressLevel = compressLevel)
+            return startTime, newEndTime
 
-    # Seek to final frame and change the framerate
-    with open(fidDict[firstFilepath][4], "r+b") as firstInputFile:
-        firstInputFile.seek(-1, 2) # Set file position one character before the end of the file
-        lastLineStr = ""
-        readChar = firstInputFile.read(1).decode("utf-8")
+        # Read the final frame and change the framerate
+        with firstLtm.open("inputs", "r+b") as firstInputFile:
+            lastLineStr = readLastFrames(firstInputFile)[0][1].decode("utf-8").rstrip("\r\n")
 
-        while readChar != "\n": # Go until the beginning of the last line
-            lastLineStr = readChar + lastLineStr # Prepend all the characters except the newline
-            firstInputFile.seek(-2, 1)
-            readChar = firstInputFile.read(1).decode("utf-8")
-        firstInputFile.seek(-1, 1)
-        # File position is now right at the beginning of last line, last line is stored in lastLineStr
+            # Calculate updated num and den for the final frame, from its own fps if it has one
+            field = _framerateField(lastLineStr)
+            if field != None:
+                fieldStart, thisNum, thisDen = field
+                lastLineStr = lastLineStr[:fieldStart]
+            else:
+                thisNum, thisDen = num, den
+            newNum, newDen = _lengthenedFramerate(thisNum, thisDen, newEndTime - endTime)
+            lastLineStr += "T" + str(newNum) + ":" + str(newDen) + "|"
 
-        # This part assumes that the last frame is at the default fps, which it should be.
-        lastLineStr += "T" + str(newNum) + ":" + str(newDen) + "|"
+            # Add an additional frame for the reset lasting 1ms
+            # resetFrameStr = "|K|FR|T1000:1|"
+            # We don't really need a reset frame if it's going to reset anyway
+            rewriteLastFrame(firstInputFile, lastLineStr)
 
-        #We are now at the beginning of the last line
-        # Add an additional frame for the reset lasting 1ms
-        # resetFrameStr = "|K|FR|T1000:1|"
+        # Write the first file back
+        firstLtm.save(compressLevel = compressLevel)
+    return startTime, newEndTime
 
-        # firstInputFile.write((lastLineStr + "\n" + resetFrameStr + "\n").encode("utf-8"))
-        # We don't really need a reset frame if it's going to reset anyway
-        firstInputFile.write((lastLineStr + "\n").encode("utf-8"))
+def _lengthenedFramerate(num, den, micros):
+    """
+    Returns the framerate of a frame that lasts a number of microseconds longer than a frame at num:den, in lowest terms.
+    """
+    period = Fraction(den, num) + Fraction(micros, 1000000)
+    return period.denominator, period.numerator
 
-    # Close and merge
-    closeltm(fidDict, merge={firstFilepath:True, secondFilepath:False})
-    return startTime, newEndTime
+def _reseedOverrides(inputs, stateIndicesList, microsList, framesList):
+    """
+    Works out the framerate overrides that make each reseed in the inputs land on the desired state, see reseedGameReset().
+
+    Raises:
+        ValueError: The desired state of a reseed isn't reached within matchState()'s search.
+
+    Returns:
+        list, list: (frame, (num, den)) overrides for InputsTable.applyFramerates(), and the micros added to each frame.
+    """
+    microsAdditions = [0] * len(framesList)
+    cumulativeMicrosAdditions = 0
+
+    # Work out how many micros to add in each spot
+    for i in range(len(framesList)):
+        thisNewMicros = matchState(stateIndicesList[i], microsList[i] + cumulativeMicrosAdditions)
+        if thisNewMicros == -1:
+            raise ValueError("State {} for frame {} was not found within the search after {} micros".format(
+                stateIndicesList[i], framesList[i], microsList[i] + cumulativeMicrosAdditions))
+        microsAdditions[i] = thisNewMicros - microsList[i] - cumulativeMicrosAdditions
+        cumulativeMicrosAdditions += microsAdditions[i]
+
+    # Lengthen each frame by its micros, keeping any variable fps it already had
+    overrides = []
+    for i in range(len(framesList)):
+        overrides.append((framesList[i], _lengthenedFramerate(*inputs.framerate(framesList[i]), microsAdditions[i])))
+    return overrides, microsAdditions
+
+def _plannedReseedOverrides(inputs, framesList, microsAdditions, minFps = None, maxFps = None):
+    """
+    Plans the framerates that add microsAdditions to each frame in framesList with planFramerates(), one reseed after
+    another, so each reseed lands on its microsecond in libTAS's own timing.
+
+    Raises:
+        ValueError: A delay can't be reached within the fps limits.
+
+    Returns:
+        list: (frame, (num, den)) overrides for InputsTable.applyFramerates(), in frame order.
+    """
+    plannedOverrides = {}
+    for i in range(len(framesList)):
+        plannedOverrides.update(planFramerates(inputs, framesList[i], microsAdditions[i], minFps, maxFps,
+                                               overrides = plannedOverrides))
+    return sorted(plannedOverrides.items())
+
+def optimizeReseeds(inputs, stateIndicesList, microsList, framesList, candidateCount = 8, minFps = None, maxFps = None,
+                    searchSizeLimit = 10000000):
+    """
+    Plans the reseeds of reseedGameReset() together instead of one at a time. For each reseed the candidateCount earliest
+    micros with the desired state that are still reachable are found, and dynamic programming picks one per reseed so that
+    the total time added to the movie is as small as possible, with the least total change to the frames as a tie-break.
+    Each frame's new fps has to stay between minFps and maxFps. If maxFps is given, frames can also be shortened down to
+    1/maxFps seconds, which is what lets this beat matching each reseed as early as possible in turn.
+
+    Args:
+        inputs (InputsTable): The inputs, used for the current fps of each frame.
+        stateIndicesList (list): A list of the desired state indices, from the synced TAS.
+        microsList (list): A list of the microsecond values corresponding to the frames where rng is reseeded.
+        framesList (list): A list of frames that are right before rng seed reseeding, in increasing order.
+        candidateCount (int, optional): The number of matching micros to consider for each reseed. Defaults to 8.
+        minFps (int or Fraction, optional): The lowest fps a frame can be changed to. Defaults to None, for no limit.
+        maxFps (int or Fraction, optional): The highest fps a frame can be changed to. Defaults to None, in which case
+                                            frames are only ever lengthened.
+        searchSizeLimit (int, optional): The number of microseconds to search for each reseed. Defaults to 10000000.
+
+    Raises:
+        ValueError: No set of matching micros fits within the fps limits.
+
+    Returns:
+        list, list, list: (frame, (num, den)) overrides for InputsTable.applyFramerates(),
+                          the micros added to each frame (negative if it was shortened), and the micros each reseed now happens at.
+    """
+    # Each node is (micros added so far, total change to the frames, micros of the reseed, previous node)
+    nodes = [(0, 0, None, None)]
+
+    for i in range(len(framesList)):
+        num, den = inputs.framerate(framesList[i])
+        period = Fraction(den, num) * 1000000 # The current frame length in micros
+        if maxFps == None:
+            minAddition = 0
+        else:
+            minAddition = -((period - Fraction(1000000) / Fraction(maxFps)) // 1) # Rounded up to whole micros
+        if minFps == None:
+            maxAddition = None
+        else:
+            maxAddition = (Fraction(1000000) / Fraction(minFps) - period) // 1
+
+        lowShift = min(node[0] for node in nodes) + minAddition
+        searchSize = searchSizeLimit
+        if maxAddition != None:
+            searchSize = min(searchSize, max(node[0] for node in nodes) + maxAddition - lowShift + 1)
+        hits = []
+        if searchSize > 0:
+            hits = matchStateStrided(stateIndicesList[i], microsList[i] + lowShift, 1, 0, searchSize, candidateCount)
+
+        nextNodes = []
+        for hit in hits:
+            shift = hit - microsList[i]
+            bestNode = None
+            for node in nodes:
+                addition = shift - node[0]
+                if addition < minAddition or (maxAddition != None and addition > maxAddition):
+                    continue
+                if bestNode == None or node[1] + abs(addition) < bestNode[1]:
+                    bestNode = (shift, node[1] + abs(addition), hit, node)
+            if bestNode != None:
+                nextNodes.append(bestNode)
+
+        if len(nextNodes) == 0:
+            raise ValueError("No matching micros for frame {} fit within the fps limits".format(framesList[i]))
+        nodes = nextNodes
+
+    # Walk back from the best final node
+    node = min(nodes, key = lambda node: (node[0], node[1]))
+    shifts = []
+    hitMicrosList = []
+    while node[3] != None:
+        shifts.append(node[0])
+        hitMicrosList.append(node[2])
+        node = node[3]
+    shifts.reverse()
+    hitMicrosList.reverse()
+
+    microsAdditions = [shifts[i] - (shifts[i - 1] if i > 0 else 0) for i in range(len(shifts))]
+    overrides = []
+    for i in range(len(framesList)):
+        overrides.append((framesList[i], _lengthenedFramerate(*inputs.framerate(framesList[i]), microsAdditions[i])))
+    return overrides, microsAdditions, hitMicrosList
 
-def reseedGameReset(filePath, stateIndicesList, microsList, framesList):
+def reseedGameReset(filePath, stateIndicesList, microsList, framesList, compressLevel = 1, candidateCount = 1, minFps = None, maxFps = None,
+                    exactTiming = False):
     """
     Takes as input a file path to the ltm, a list of frames where rng is re-seeded,
     a list of the current microseconds for those frames, and a list of rng states corresponding to the frames list.
@@ -840,112 +3315,485 @@ def reseedGameReset(filePath, stateIndicesList, microsList, framesList):
         filePath (str): Path to the ltm file.
         stateIndicesList (list): A list of the desired state indices, from the synced TAS.
         microsList (list): A list of the microsecond values corresponding to the frames where rng is reseeded.
-        framesList (list): A list of frames that are right before rng seed reseeding
+        framesList (list): A list of frames that are right before rng seed reseeding, in increasing order.
+        compressLevel (int, optional): The gzip compression level the file is written back with.
+                                       Defaults to 1 (fastest), since the file is recompressed when it's merged anyway.
+        candidateCount (int, optional): If more than 1, or if minFps or maxFps is given, the reseeds are planned together
+                                        with optimizeReseeds() using this many candidates each. Defaults to 1, which matches
+                                        each reseed as early as possible in turn.
+        minFps (int or Fraction, optional): The lowest fps a frame can be changed to, see optimizeReseeds(). Defaults to None.
+        maxFps (int or Fraction, optional): The highest fps a frame can be changed to, see optimizeReseeds(). Defaults to None.
+        exactTiming (bool, optional): If True, the new framerates are planned with planFramerates() so each reseed lands on its
+                                      microsecond in libTAS's own nanosecond timing, using the simplest framerates that do
+                                      and spreading a delay over earlier frames if minFps or maxFps stop one frame taking it.
+                                      Defaults to False, which lengthens each frame by exactly its micros.
+
+    Raises:
+        ValueError: A frame is out of range, repeated or out of order, a desired state isn't found,
+                    or the fps limits can't be met. The file is left unchanged.
 
     Returns:
-        None.
+        list: (frame, oldFramerate, newFramerate) for each changed frame, see InputsTable.applyFramerates().
 
     """
 
-    # First open the ltm file
-    fidDict = openltm(filePath)
-    num, den, varfps = getFPSConfig(fidDict[filePath][2])
+    # First open the ltm file and check the frames before searching. The with statement closes it on every error.
+    with LtmArchive(filePath) as ltm:
+        inputs = InputsTable.fromLtm(ltm)
+        inputs.checkOverrides((frame, None) for frame in framesList)
+        num, den, varfps = getFPSConfig(ltm)
 
-    # Set variable fps to true if it is not
-    if varfps == False:
-        setFPSConfig(fidDict[filePath][2], variable_framerate = True)
+        # Set variable fps to true if it is not
+        if varfps == False:
+            setFPSConfig(ltm, variable_framerate = True)
 
-    microsAdditions = [0] * len(framesList)
-    cumulativeMicrosAdditions = 0
+        if candidateCount > 1 or minFps != None or maxFps != None:
+            overrides, microsAdditions, hitMicrosList = optimizeReseeds(inputs, stateIndicesList, microsList, framesList,
+                                                                        candidateCount, minFps, maxFps)
+        else:
+            overrides, microsAdditions = _reseedOverrides(inputs, stateIndicesList, microsList, framesList)
 
-    # Work out how many micros to add in each spot
-    for i in range(len(framesList)):
-        thisNewMicros = matchState(stateIndicesList[i], microsList[i] + cumulativeMicrosAdditions)
-        microsAdditions[i] = thisNewMicros - microsList[i] - cumulativeMicrosAdditions
-        cumulativeMicrosAdditions += microsAdditions[i]
+        if exactTiming: # Plan the framerates again against libTAS's timing
+            overrides = _plannedReseedOverrides(inputs, framesList, microsAdditions, minFps, maxFps)
+        changes = inputs.applyFramerates(overrides)
+        inputs.toLtm(ltm)
+
+        # Write back
+        ltm.save(compressLevel = compressLevel)
+
+    return changes
+
+def mergeMany(filePaths, outputFilepath, statesFiles = None, compressLevel = 9, exactTiming = False):
+    """
+    Merges any number of .ltm files into one output .ltm file in a single pass, reading each file once and writing the output once.
+    This does the same as running appendResetAndSeed(), reseedGameReset() and mergeLibtasFiles() on each pair of files in turn,
+    without changing the input files:
+        * The last frame of each file is lengthened so the next file starts on the RNG state it was recorded with.
+        * If a states file is given for a file, its reseeds are moved onto the desired states like reseedGameReset().
+        * Frames of files at a different fps from the first file are given their fps as variable fps with convertFPS().
+        * The rerecord counts and savestate frame counts of all the files are added together.
+        * The length and frame count are worked out for the merged movie, with libTAS's nanosecond counting.
+    Only two files' inputs are kept in memory at a time.
+
+    Args:
+        filePaths (list): The paths to the .ltm files, in order.
+        outputFilepath (str): Path to the output .ltm file. Will be overwritten if it exists.
+        statesFiles (list, optional): For each file, the path to its states file in the format state,micros,frame
+                                      (see statesFileToLists()) with micros from the file's own start time, or None
+                                      if there are no reseeds to fix. Defaults to None, for no states files.
+        compressLevel (int, optional): The gzip compression level of the output file. Defaults to 9.
+        exactTiming (bool, optional): If True, the lengthened last frames and the reseeds are planned with planFramerates()
+                                      so they land on the right microsecond in libTAS's own nanosecond timing, like
+                                      reseedGameReset(). Defaults to False, which lengthens frames by exactly the micros.
+
+    Raises:
+        ValueError: Fewer than two files were given, the states files don't match the files,
+                    or no matching RNG state was found for the start of a file or a reseed in a states file.
+                    The output file is only written once everything has been merged, so it's left as it was.
 
-    # Go through the lines and add new fps lines
-    with open(fidDict[filePath][4], "r") as inputFile, open(fidDict[filePath][4] + "_new", "w") as outputFile:
-        lineIndex = 0
-        for line in inputFile:
-            lineIndex += 1
-            if lineIndex not in framesList:
-                outputFile.write(line)
+    Returns:
+        list: The start time of each file in the merged movie, in microseconds.
+
+    File outputs:
+        outputFilepath: The merged .ltm file. Note, this will be overwritten without prompting.
+    """
+    if len(filePaths) < 2:
+        raise ValueError("At least two files are needed to merge")
+    if statesFiles == None:
+        statesFiles = [None] * len(filePaths)
+    elif len(statesFiles) != len(filePaths):
+        raise ValueError("{} states files were given for {} files".format(len(statesFiles), len(filePaths)))
+
+    # The merged inputs are collected in a temporary file, which the with statement removes on every error
+    with tempfile.SpooledTemporaryFile(max_size = 0x4000000) as outputInputs:
+        rerecordCount = 0
+        savestateFrameCount = 0
+        newestFilepath = None
+        newestVersion = None
+        newStartTimes = []
+        previousInputs = None
+        previousEndTime = 0
+        lengthNanos = 0
+        fractional = 0 # libTAS's nanosecond remainder at the end of the inputs written so far
+        frameCount = 0
+
+        for filePath, statesFilePath in zip(filePaths, statesFiles):
+            with LtmArchive(filePath) as ltm:
+                config = ltm.config
+
+                # The output is copied from the newest file, like mergeLibtasFiles()
+                version = config.version
+                if newestVersion == None or float(newestVersion[2:]) < float(version[2:]):
+                    newestFilepath = filePath
+                    newestVersion = version
+                rerecordCount += config.rerecordCount
+                savestateFrameCount += config.savestateFrameCount
+                startTime = config.startTime
+                endTime = config.endTime
+
+                if previousInputs == None: # The first file sets the output fps
+                    outputNum, outputDen = config.framerateNum, config.framerateDen
+                with ltm.open("inputs", "rb") as inputFID:
+                    if (config.framerateNum, config.framerateDen) == (outputNum, outputDen):
+                        inputs = InputsTable.read(inputFID, outputNum, outputDen)
+                    else: # Frames at the file's own fps need it spelled out, which convertFPS() does a block of bytes at a time
+                        convertedFID = io.BytesIO()
+                        convertFPS(inputFID, config.framerateNum, config.framerateDen, convertedFID, outputNum, outputDen)
+                        inputs = InputsTable(convertedFID.getvalue(), outputNum, outputDen)
+
+            if previousInputs == None: # The first file sets the start time
+                newStartTime = startTime
             else:
-                listIndex = framesList.index(lineIndex)
-                if "|T" in line: # variable fps, need to read what the fps is before changing it
-                    lineSplitByFps = line.split("|T")
-                    thisNum = int(lineSplitByFps[1].split(":")[0])
-                    line = lineSplitByFps[0] + "|\n" # Remove the old variable fps from the line
-                else: # base fps, no need to try to read the frame fps
-                    thisNum = num
-                newNum = thisNum * 1000000
-                newDen = den * 1000000 + (thisNum * (microsAdditions[listIndex]))
-                outputFile.write(line.strip("\n") + "T" + str(newNum) + ":" + str(newDen) + "|\n")
-    os.remove(fidDict[filePath][4])
-    os.rename(fidDict[filePath][4] + "_new", fidDict[filePath][4])
-
-    # Close and merge
-    closeltm(fidDict, merge=True)
-
-def correctStatesFile(inputFilePath, startTime, outputFile = "seedsMicrosOutput.txt"):
-    """
-    Takes as input a path to states.txt, which is of the following format:
+                # Lengthen the last frame of the previous file to reach the RNG state this file starts with
+                newStartTime = matchState(randomizeMicrosState(startTime), previousEndTime)
+                if newStartTime < previousEndTime:
+                    raise ValueError("No matching RNG state was found for the start of {}".format(filePath))
+                lastFrame = len(previousInputs)
+                if exactTiming:
+                    previousInputs.applyFramerates(planFramerates(previousInputs, lastFrame, newStartTime - previousEndTime))
+                else:
+                    lastFramerate = _lengthenedFramerate(*previousInputs.framerate(lastFrame), newStartTime - previousEndTime)
+                    previousInputs.applyFramerates([(lastFrame, lastFramerate)])
+                previousInputs.write(outputInputs)
+                segmentNanos, fractional = libtasNanosAtFrame(previousInputs, len(previousInputs) + 1, fractional = fractional)
+                lengthNanos += segmentNanos
+                frameCount += len(previousInputs)
+            newStartTimes.append(newStartTime)
+
+            microsAdded = 0
+            if statesFilePath != None:
+                try:
+                    statesList, microsList, framesList = statesFileToLists(statesFilePath, startTime, newStartTime)
+                    overrides, microsAdditions = _reseedOverrides(inputs, statesList, microsList, framesList)
+                    if exactTiming:
+                        overrides = _plannedReseedOverrides(inputs, framesList, microsAdditions)
+                    inputs.applyFramerates(overrides)
+                except ValueError as error:
+                    raise ValueError("{}: {}".format(statesFilePath, error)) from error
+                microsAdded = sum(microsAdditions)
+
+            previousInputs = inputs
+            previousEndTime = endTime - startTime + newStartTime + microsAdded
+        previousInputs.write(outputInputs)
+        lengthNanos += libtasNanosAtFrame(previousInputs, len(previousInputs) + 1, fractional = fractional)[0]
+        frameCount += len(previousInputs)
+
+        # Finally, write the output file from the newest file
+        with LtmArchive(newestFilepath) as outputLtm:
+            outputConfig = outputLtm.config
+            outputConfig.framerateNum = outputNum
+            outputConfig.framerateDen = outputDen
+            outputConfig.variableFramerate = True
+            outputConfig.rerecordCount = rerecordCount
+            outputConfig.savestateFrameCount = savestateFrameCount
+            outputConfig.lengthNanos = lengthNanos
+            outputConfig.frameCount = frameCount
+
+            outputInputs.seek(0)
+            with outputLtm.open("inputs", "wb") as outputFID:
+                shutil.copyfileobj(outputInputs, outputFID, 0x100000)
+            outputLtm.save(outputFilepath, compressLevel)
+
+    return newStartTimes
+
+# The column layouts of the states files used along the way
+modStatesColumns = ("state", "approxMicros", "seed") # states.txt from the game mod
+modStepsStatesColumns = ("state", "approxMicros", "seed", "steps") # states.txt from the game mod with its game step counter
+correctedStatesColumns = ("state", "exactMicros", "seed") # correctStatesFile() output
+correctedFramesStatesColumns = ("state", "exactMicros", "seed", "frame") # correctStatesFile() output with frames
+reseedStatesColumns = ("state", "exactMicros", "frame") # statesFileToLists() input with the seeds replaced by frames by hand
+
+class StatesLog:
+    """
+    The records of a states file kept in columns, one array per field, with -1 for a field that isn't known.
+    Reads and writes any of the comma separated layouts used along the way (see modStatesColumns and the other layouts),
+    so the same records can go from the game mod's output to reseedGameReset() without changing their meaning.
+
+    Attributes:
+        state (array): The RNG state index of each record.
+        approxMicros (array): The approximate microseconds from the game mod.
+        exactMicros (array): The exact microseconds, from correctStatesFile() or libTAS.
+        seed (array): The RNG seed.
+        frame (array): The frame of the movie the state was generated on.
+        steps (array): The game mod's count of game steps since the first launch. This isn't a frame of the movie,
+                       since it carries on across launches, so it's only kept to read the mod's output.
+        trailingNewline (bool): Whether the text ends with a newline, so a file read and written again is unchanged.
+    """
+    columns = ("state", "approxMicros", "exactMicros", "seed", "frame", "steps")
+
+    def __init__(self):
+        for column in self.columns:
+            setattr(self, column, array("q"))
+        self.trailingNewline = False
+
+    @classmethod
+    def read(cls, filePath, columns = None):
+        """
+        Reads a states file.
+
+        Args:
+            filePath (str): The path to the states file.
+            columns (tuple or dict, optional): The column names of the file, in order, or {number of fields: column names}
+                                               to pick them by the number of fields on the first line. Defaults to None,
+                                               in which case lines of 3 fields are read as modStatesColumns
+                                               and lines of 4 as modStepsStatesColumns.
+
+        Returns:
+            StatesLog: The records.
+        """
+        with open(filePath, newline = "") as fid:
+            return cls.fromText(fid.read(), columns)
+
+    @classmethod
+    def fromText(cls, text, columns = None):
+        """
+        Parses the text of a states file, see read().
+        """
+        statesLog = cls()
+        lines = text.splitlines()
+        statesLog.trailingNewline = text.endswith("\n")
+        if columns == None:
+            columns = {3: modStatesColumns, 4: modStepsStatesColumns}
+        if isinstance(columns, dict):
+            fieldCount = lines[0].count(",") + 1 if len(lines) > 0 else min(columns)
+            if fieldCount not in columns:
+                raise ValueError("Unknown states file layout with {} fields".format(fieldCount))
+            columns = columns[fieldCount]
+
+        missingColumns = [getattr(statesLog, column) for column in cls.columns if column not in columns]
+        for lineIndex in range(len(lines)):
+            fields = lines[lineIndex].split(",")
+            if len(fields) != len(columns):
+                raise ValueError("Line {} has {} fields instead of {}".format(lineIndex + 1, len(fields), len(columns)))
+            for column, field in zip(columns, fields):
+                getattr(statesLog, column).append(int(field))
+            for missingColumn in missingColumns:
+                missingColumn.append(-1)
+        return statesLog
+
+    def write(self, filePath, columns):
+        """
+        Writes the records to a states file.
+
+        Args:
+            filePath (str): The path to the states file. Note, this will be overwritten without prompting.
+            columns (tuple): The column names to write, in order.
+
+        Returns:
+            None.
+        """
+        with open(filePath, "w", newline = "") as fid:
+            fid.write(self.toText(columns))
+
+    def toText(self, columns):
+        """
+        Returns the records as the text of a states file, see write().
+        """
+        columnArrays = [getattr(self, column) for column in columns]
+        text = "\n".join(",".join(str(columnArray[index]) for columnArray in columnArrays) for index in range(len(self)))
+        if self.trailingNewline and len(self) > 0:
+            text += "\n"
+        return text
+
+    def __len__(self):
+        return len(self.state)
+
+    def append(self, state, approxMicros = -1, exactMicros = -1, seed = -1, frame = -1, steps = -1):
+        """
+        Adds a record at the end.
+        """
+        self.state.append(state)
+        self.approxMicros.append(approxMicros)
+        self.exactMicros.append(exactMicros)
+        self.seed.append(seed)
+        self.frame.append(frame)
+        self.steps.append(steps)
+
+    def record(self, index):
+        """
+        Returns a record as a dict of {column: value}.
+        """
+        return {column: getattr(self, column)[index] for column in self.columns}
+
+    def slice(self, start, stop = None):
+        """
+        Returns a new StatesLog with the records from start up to but not including stop.
+        """
+        statesLog = StatesLog()
+        for column in self.columns:
+            setattr(statesLog, column, getattr(self, column)[start:stop])
+        statesLog.trailingNewline = self.trailingNewline
+        return statesLog
+
+    def indexAtFrame(self, frame):
+        """
+        Returns the index of the first record on a frame, or -1 if there's none. The records have to be in frame order.
+        """
+        index = bisect_left(self.frame, frame)
+        if index < len(self) and self.frame[index] == frame:
+            return index
+        return -1
+
+    def indexAtMicros(self, micros, exact = True):
+        """
+        Returns the index of the last record at or before a microsecond value, or -1 if there's none.
+        The records have to be in time order.
+
+        Args:
+            micros (int): The microseconds.
+            exact (bool, optional): Whether to use the exact microseconds instead of the approximate ones. Defaults to True.
+
+        Returns:
+            int: The index of the record.
+        """
+        return bisect_right(self.exactMicros if exact else self.approxMicros, micros) - 1
+
+def correctStatesFile(inputFilePath, startTime, outputFile = "seedsMicrosOutput.txt", timeIndex = None):
+    """
+    Takes as input a path to states.txt from the game mod, which is of the following format:
         state,microseconds,seed
-    where the microseconds are an approximation for when the state occurred and the states are generated
-    with the formula given in seedToState(), seeds.txt with one seed per line, the number of microseconds from the old start time,
-    and the number of microseconds in the new start time when merged. Reads the states and microseconds and then replaces the
-    microseconds with the exact correct microseconds value using the corresponding seed and start time.
-    Frames are not possible to retrieve through this method so they must be retrieved in libTAS.
+    or, from newer versions of the mod,
+        state,microseconds,seed,steps
+    where the microseconds are an approximation for when the state occurred, counted from the start time,
+    and the states are generated with the formula given in seedToState(). Reads the states and microseconds and then replaces
+    the microseconds with the exact correct microseconds value using the corresponding seed and start time.
+    All of the seeds are resolved together with resolveSeeds(), and a summary is printed of how far each was from its
+    approximate microseconds, followed by the distance for each line. Lines that can't be resolved get -1 as their microseconds.
+    The steps are the mod's count of game steps since the first launch, which carries on across launches, so they aren't
+    frames of the movie and are left out of the output.
+    If a time index of the file is given, the frame each state happens on is worked out from its exact microseconds.
+    Frames are then written as a fourth entry on each line, so they don't have to be filled in by hand.
+    Lines that are unresolved or past the end of the movie get -1 as their frame.
 
     Args:
-        statesFilePath (string): A path to the states.txt file to be corrected
+        inputFilePath (string): A path to the states.txt file to be corrected
         startTime (int): Number of microseconds corresponding with the start time
+        outputFile (string, optional): A path for the corrected file. Defaults to "seedsMicrosOutput.txt".
+        timeIndex (TimeIndex, optional): The time index of the file, starting at startTime. Defaults to None.
 
     Returns:
         string: the output file path.
 
     """
-
-    statesList = []
-    microsList = []
-    seedsList = []
-    with open(inputFilePath, "r") as statesfid:
-        for line in statesfid:
-            statesList += [int(line.split(",")[0])]
-            microsList += [int(line.split(",")[1])]
-            seedsList += [int(line.split(",")[2])]
-
-    with open(outputFile, "w") as outfid:
-        for index in range(len(seedsList)):
-            if index == 0: # Skip the first line
-                continue
-            elif index > 1: # Add the newline here so that there isn't an extra newline at the end
-                outfid.write("\n")
-            outfid.write(str(statesList[index]) + "," + str(matchSeed(seedsList[index], microsList[index] + startTime)) + "," + str(seedsList[index]))
-            # Match seeds here because there are more seeds than states
+    statesLog = StatesLog.read(inputFilePath).slice(1) # Skip the first line
+
+    # Match seeds here because there are more seeds than states
+    resolvedList = resolveSeeds(statesLog.seed, [micros + startTime for micros in statesLog.approxMicros])
+    for index in range(len(resolvedList)):
+        statesLog.exactMicros[index] = resolvedList[index][0]
+        if timeIndex != None and resolvedList[index][1] != None:
+            try: # The frame that ends right when the micros are reached
+                statesLog.frame[index] = timeIndex.frameAtMicros(resolvedList[index][0] - 1)
+            except ValueError: # Past the end of the movie
+                statesLog.frame[index] = -1
+
+    # No newline at the end of the file
+    statesLog.trailingNewline = False
+    if timeIndex != None: # Frames are only written when they were worked out from the movie
+        statesLog.write(outputFile, correctedFramesStatesColumns)
+    else:
+        statesLog.write(outputFile, correctedStatesColumns)
+
+    # Report how far off the approximate microseconds were, overall and for each line (line numbers of the input file)
+    distances = [distance for micros, distance in resolvedList if distance != None]
+    unresolvedLines = [str(index + 2) for index in range(len(resolvedList)) if resolvedList[index][1] == None]
+    if len(distances) > 0:
+        print("Resolved {} of {} seeds, at most {} micros after the approximation (mean {:.0f}).".format(
+            len(distances), len(resolvedList), max(distances), sum(distances) / len(distances)))
+        print("Micros after the approximation by line: {}.".format(", ".join("{}: {}".format(index + 2, resolvedList[index][1])
+            for index in range(len(resolvedList)) if resolvedList[index][1] != None)))
+    if len(unresolvedLines) > 0:
+        print("No matching micros value was found for line(s) {} of {}.".format(", ".join(unresolvedLines), inputFilePath))
 
     return outputFile
 
-def statesFileToLists(statesFilePath, oldStartTime, newStartTime):
+def resolveSeeds(seedsList, microsList, searchSizeLimit = 10000000):
+    """
+    Batch version of matchSeed(). Finds the first microsecond value at or after each approximate microsecond value
+    that produces each seed. The rows are resolved in order of their microseconds, and each seed is only solved once
+    per 2^32 microsecond block, so seeds that repeat cost one lookup each.
+
+    Args:
+        seedsList (list): The seeds that are to be matched.
+        microsList (list): The approximate microseconds for each seed, the minimum value to return.
+        searchSizeLimit (int, optional): The number of microseconds after each approximation to search. Defaults to 10000000.
+
+    Returns:
+        list: (micros, distance) for each seed in the order given, where distance is micros minus the approximation.
+              Seeds that couldn't be resolved within searchSizeLimit get (-1, None).
+    """
+    resolvedList = [(-1, None)] * len(seedsList)
+    solutions = {} # {(seed, highWord): matching lower 32 bits}, only for the current block
+
+    for index in sorted(range(len(seedsList)), key = lambda index: microsList[index]):
+        seed = seedsList[index] & 0xFFFFFFFF
+        startMicros = microsList[index]
+        stopMicros = startMicros + searchSizeLimit
+
+        # The upper 32 bits of the time only get added into the seed, so each 2^32 microsecond block is solved separately.
+        highWord = startMicros >> 0x20
+        if len(solutions) > 0 and next(iter(solutions))[1] < highWord: # The sweep left the cached block behind
+            solutions = {}
+        while highWord << 0x20 < stopMicros:
+            if (seed, highWord) not in solutions:
+                solutions[(seed, highWord)] = _solveSeedLow32(seed, highWord)
+            lowList = solutions[(seed, highWord)]
+            lowIndex = bisect_left(lowList, max(startMicros - (highWord << 0x20), 0))
+            if lowIndex < len(lowList):
+                micros = highWord << 0x20 | lowList[lowIndex]
+                if micros < stopMicros:
+                    resolvedList[index] = (micros, micros - startMicros)
+                break
+            highWord += 1
+
+    return resolvedList
+
+def statesFileToLists(statesFilePath, oldStartTime, newStartTime, timeIndex = None):
     """
     Takes as input a path to states.txt and outputs the lists expected by reseedGameReset().
+    Lines with -1 as their micros (unresolved by correctStatesFile()) and, with a time index, lines outside the movie
+    are skipped, and their line numbers are printed.
 
     Args:
-        statesFilePath (string): A path to the states.txt file with each line in the format state,micros,frame.
+        statesFilePath (string): A path to the states.txt file with each line in the format state,micros,seed,frame
+                                 from correctStatesFile(), or state,micros,frame.
+        timeIndex (TimeIndex, optional): The time index of the second file, starting at oldStartTime. If given, the frames
+                                         are worked out from the micros instead of read from the file, so they stay right
+                                         if the micros were changed by hand. Defaults to None.
+
+    Raises:
+        ValueError: No time index was given and a line has no frame (-1). The frames aren't guessed.
 
     Returns:
         list, list, list: states list, micros list, frames list.
 
     """
+    statesLog = StatesLog.read(statesFilePath, {3: reseedStatesColumns, 4: correctedFramesStatesColumns})
     statesList = []
     microsList = []
     framesList = []
-    with open(statesFilePath) as fid:
-        for line in fid:
-            statesList += [int(line.split(",")[0])]
-            microsList += [int(line.split(",")[1]) - oldStartTime + newStartTime]
-            framesList += [int(line.split(",")[2])]
+    skippedLines = []
+    for index in range(len(statesLog)):
+        micros = statesLog.exactMicros[index]
+        if micros == -1: # Unresolved by correctStatesFile()
+            skippedLines.append(str(index + 1))
+            continue
+        if timeIndex != None:
+            try: # The frame that ends right when the micros are reached
+                frame = timeIndex.frameAtMicros(micros - 1)
+            except ValueError: # Outside the movie
+                skippedLines.append(str(index + 1))
+                continue
+        else:
+            frame = statesLog.frame[index]
+            if frame == -1:
+                raise ValueError("Line {} has no frame, so a time index is needed to work it out".format(index + 1))
+        statesList.append(statesLog.state[index])
+        microsList.append(micros - oldStartTime + newStartTime)
+        framesList.append(frame)
+
+    if len(skippedLines) > 0:
+        print("Skipped line(s) {} of {}, which are unresolved or outside the movie.".format(", ".join(skippedLines), statesFilePath))
 
     return statesList, microsList, framesList
 
@@ -953,12 +3801,12 @@ def statesFileToLists(statesFilePath, oldStartTime, newStartTime):
 #     1. Convert all files to libTAS version 1.4.4 and fps denominator of 1.
 #     2. Run appendResetAndSeed() on the two files to be merged, storing the output (original start time and new start time of second file)
 #     3. Use the states file mod to run the second file.
-#     4. Run states.txt through correctStatesFile() using the normal start time of the second file.
+#     4. Run states.txt through correctStatesFile() using the normal start time of the second file and its TimeIndex, which fills in the frames.
 #     5. Run the second file through libTAS again, either on the mod or vanilla.
 #     6. At each point, find the exact microsecond value using libTAS's Elapsed Time.
 #     7. If the exact Elapsed Time is missed, run matchSeed with the seed and a higher micros number until it's exactly hit.
-#     8. In the file, replace the micros if needed and replace the seed (third entry on each line) with the frame count when you hit those micros.
-#     9. Take the old start time, new start time, number of preceding frames, and the file path and feed into statesFileToLists().
+#     8. In the file, replace the micros (second entry on each line) if needed.
+#     9. Take the old start time, new start time, the second file's TimeIndex, and the file path and feed into statesFileToLists().
 #    10. Feed the filepath to the second ltm file and the output of statesFileToLists() to the reseedGameReset() function.
 #    11. Feed the two filepaths and the output path to mergeLibtasFiles().
 #    12. Repeat all steps as needed to merge all files.
@@ -985,21 +3833,23 @@ Note that the input files will be modified, so make backups if needed.\n\n")
         firstFilePath = input("Enter the path to the first file: ")
         secondFilePath = input("Enter the path to the second file: ")
         # numPrecedingFrames = int(input("Enter the length of the first file in frames: ")) + 1
-        oldStartTime, newStartTime = appendResetAndSeed(firstFilePath, secondFilePath)
+        oldStartTime, newStartTime = appendResetAndSeed(firstFilePath, secondFilePath, exactTiming = True)
 
         print("\nBefore continuing, complete the following step:\n\
 \t* Use the states file mod to run the second file.\n\
 When you have finished this step, enter the file path to the states.txt file below.")
         statesFilePath = input("Enter the path to the states.txt file: ")
         statesOutputFilePath = input("Enter a path for the new states.txt file: ")
-        correctStatesFile(statesFilePath, oldStartTime, statesOutputFilePath)
+        with LtmArchive(secondFilePath) as secondLtm: # The frames are worked out from the micros
+            timeIndex = TimeIndex.fromLtm(secondLtm)
+        correctStatesFile(statesFilePath, oldStartTime, statesOutputFilePath, timeIndex)
 
         print("\nBefore continuing, complete the following steps:\n\
 \t* Run the second ltm file through libTAS again, either on the mod or vanilla.\n\
-\t* At each point from the output states.txt, find the exact microsecond value (second entry on each line) using libTAS's Elapsed Time.\n\
+\t* At each point from the output states.txt, check the exact microsecond value (second entry on each line) using libTAS's Elapsed Time.\n\
+\t  The frame (fourth entry on each line) is where the Elapsed Time should reach it.\n\
 \t* If the exact Elapsed Time is missed, enter the seed and the next value of microseconds below.\n\
-\t* In the file, replace the micros (second entry on each line) if needed\n\
-\t  and replace the seed (third entry on each line) with the frame count when you hit those micros.\n\
+\t* In the file, replace the micros (second entry on each line) if needed. The frames are updated to match automatically.\n\
 \t* Press Enter without typing anything below to continue to the next step.")
         while True: # Loop as long as needed until a non-integer is entered
             try:
@@ -1007,9 +3857,17 @@ When you have finished this step, enter the file path to the states.txt file bel
                 microsToSearch = int(input("Enter the micros to search (Elapsed Time): "))
             except ValueError: # A non-integer was entered so move to the next step
                 break
-            print("Your new micros value is {}.\n".format(matchSeed(seedToSearch, microsToSearch)))
+            microsList = seedToMicros(seedToSearch, microsToSearch, 3, 10000000)
+            if len(microsList) == 0:
+                print("No matching micros value was found.\n")
+            else:
+                print("Your new micros value is {}.".format(microsList[0]))
+                if len(microsList) > 1:
+                    print("The following matching micros values are: {}.".format(", ".join(str(micros) for micros in microsList[1:])))
+                print("")
 
-        reseedGameReset(secondFilePath, *statesFileToLists(statesOutputFilePath, oldStartTime, newStartTime)) # An extra 1000 micros due to restart frame
+        reseedGameReset(secondFilePath, *statesFileToLists(statesOutputFilePath, oldStartTime, newStartTime, timeIndex),
+                        exactTiming = True) # An extra 1000 micros due to restart frame
 
         outputFilePath = input("\nEnter the output merged ltm file path: ")
         mergeLibtasFiles(firstFilePath, secondFilePath, outputFilePath)